@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+音楽ファイルの長さ取得
+MP3・WAV・OGG のヘッダだけを読んで再生時間を求める。
+ヘッダから求められない場合に限り、pygame で全体をデコードして長さを取得する
+"""
+
+import os
+import struct
+
+# 結果のキャッシュ（絶対パス → (サイズ, 更新時刻, 長さ)）
+_duration_cache = {}
+
+# MP3 のビットレート表（kbps）: (MPEG1かどうか, レイヤー) → 表
+MP3_BITRATES = {
+    (True, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (True, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (True, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (False, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (False, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (False, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+
+# MP3 のサンプリング周波数表: MPEGバージョンのビット値 → 表
+MP3_SAMPLE_RATES = {
+    3: [44100, 48000, 32000],  # MPEG1
+    2: [22050, 24000, 16000],  # MPEG2
+    0: [11025, 12000, 8000],   # MPEG2.5
+}
+
+# ヘッダ解析で読み込む先頭部分のサイズ
+HEAD_READ_SIZE = 64 * 1024
+# OGG の最終ページを探すために読み込む末尾部分のサイズ
+OGG_TAIL_READ_SIZE = 64 * 1024
+
+
+def get_duration(path):
+    """音楽ファイルの長さ（秒）を返す。取得できなければ None"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    key = os.path.abspath(path)
+    cached = _duration_cache.get(key)
+    if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+        return cached[2]
+
+    duration = probe_duration(path)
+    if duration is None:
+        duration = _decode_duration(path)
+    if duration is not None:
+        _duration_cache[key] = (stat.st_size, stat.st_mtime_ns, duration)
+    return duration
+
+
+def probe_duration(path):
+    """ヘッダ情報だけから長さ（秒）を求める。求められなければ None"""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(HEAD_READ_SIZE)
+            if head.startswith(b"RIFF") and head[8:12] == b"WAVE":
+                return _probe_wav(head)
+            if head.startswith(b"OggS"):
+                return _probe_ogg(f, head)
+            return _probe_mp3(f, head)
+    except (OSError, struct.error, ValueError):
+        return None
+
+
+def _decode_duration(path):
+    """pygame で全体をデコードして長さを求める（最後の手段）"""
+    try:
+        import pygame
+        return pygame.mixer.Sound(path).get_length()
+    except Exception:
+        return None
+
+
+def _probe_wav(head):
+    """WAV の fmt / data チャンクから長さを求める"""
+    byte_rate = None
+    pos = 12
+    while pos + 8 <= len(head):
+        chunk_id = head[pos:pos + 4]
+        chunk_size, = struct.unpack_from("<I", head, pos + 4)
+        if chunk_id == b"fmt ":
+            byte_rate, = struct.unpack_from("<I", head, pos + 16)
+        elif chunk_id == b"data":
+            if not byte_rate:
+                return None
+            return chunk_size / byte_rate
+        pos += 8 + chunk_size + (chunk_size & 1)
+    return None
+
+
+def _probe_ogg(f, head):
+    """OGG の識別ヘッダと最終ページのグラニュール位置から長さを求める"""
+    sample_rate = None
+    pre_skip = 0
+    vorbis_pos = head.find(b"\x01vorbis")
+    opus_pos = head.find(b"OpusHead")
+    if vorbis_pos >= 0:
+        sample_rate, = struct.unpack_from("<I", head, vorbis_pos + 12)
+    elif opus_pos >= 0:
+        # Opus のグラニュール位置は常に 48kHz 単位
+        pre_skip, = struct.unpack_from("<H", head, opus_pos + 10)
+        sample_rate = 48000
+    if not sample_rate:
+        return None
+
+    # 末尾から最後のページを探す
+    f.seek(0, os.SEEK_END)
+    file_size = f.tell()
+    f.seek(max(0, file_size - OGG_TAIL_READ_SIZE))
+    tail = f.read()
+    last_page = tail.rfind(b"OggS")
+    if last_page < 0 or last_page + 14 > len(tail):
+        return None
+    granule, = struct.unpack_from("<q", tail, last_page + 6)
+    if granule <= 0:
+        return None
+    return (granule - pre_skip) / sample_rate
+
+
+def _parse_mp3_header(data, pos):
+    """MP3 フレームヘッダを解析する。無効なら None"""
+    if pos + 4 > len(data) or data[pos] != 0xFF or (data[pos + 1] & 0xE0) != 0xE0:
+        return None
+    version_bits = (data[pos + 1] >> 3) & 0x03
+    layer_bits = (data[pos + 1] >> 1) & 0x03
+    bitrate_index = data[pos + 2] >> 4
+    sample_rate_index = (data[pos + 2] >> 2) & 0x03
+    if version_bits == 1 or layer_bits == 0 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    mpeg1 = version_bits == 3
+    layer = 4 - layer_bits
+    bitrate = MP3_BITRATES[(mpeg1, layer)][bitrate_index] * 1000
+    sample_rate = MP3_SAMPLE_RATES[version_bits][sample_rate_index]
+    padding = (data[pos + 2] >> 1) & 0x01
+    mono = (data[pos + 3] >> 6) == 3
+
+    if layer == 1:
+        samples_per_frame = 384
+        frame_length = (12 * bitrate // sample_rate + padding) * 4
+    elif layer == 2 or mpeg1:
+        samples_per_frame = 1152
+        frame_length = 144 * bitrate // sample_rate + padding
+    else:
+        samples_per_frame = 576
+        frame_length = 72 * bitrate // sample_rate + padding
+
+    # サイド情報の大きさ（Xing タグの位置を求めるのに使う）
+    if mpeg1:
+        side_info_size = 17 if mono else 32
+    else:
+        side_info_size = 9 if mono else 17
+
+    return {
+        "bitrate": bitrate,
+        "sample_rate": sample_rate,
+        "samples_per_frame": samples_per_frame,
+        "frame_length": frame_length,
+        "side_info_size": side_info_size,
+    }
+
+
+def _probe_mp3(f, head):
+    """MP3 の Xing/Info・VBRI タグまたはビットレートから長さを求める"""
+    # ID3v2 タグを読み飛ばす
+    audio_start = 0
+    if head.startswith(b"ID3") and len(head) >= 10:
+        size = ((head[6] & 0x7F) << 21) | ((head[7] & 0x7F) << 14) | ((head[8] & 0x7F) << 7) | (head[9] & 0x7F)
+        audio_start = 10 + size + (10 if head[5] & 0x10 else 0)
+        if audio_start + 4 > len(head):
+            f.seek(audio_start)
+            head = b"\x00" * audio_start + f.read(HEAD_READ_SIZE)
+
+    # 最初の有効なフレームを探す（次のフレームも同期していることを確認する）
+    pos = audio_start
+    header = None
+    while pos + 4 <= len(head):
+        header = _parse_mp3_header(head, pos)
+        if header:
+            next_pos = pos + header["frame_length"]
+            if next_pos + 4 > len(head) or _parse_mp3_header(head, next_pos):
+                break
+        header = None
+        pos += 1
+    if header is None:
+        return None
+
+    sample_rate = header["sample_rate"]
+    samples_per_frame = header["samples_per_frame"]
+
+    # Xing/Info タグ（VBR・LAME の CBR）
+    xing_pos = pos + 4 + header["side_info_size"]
+    if head[xing_pos:xing_pos + 4] in (b"Xing", b"Info"):
+        flags, = struct.unpack_from(">I", head, xing_pos + 4)
+        if flags & 0x01:
+            frame_count, = struct.unpack_from(">I", head, xing_pos + 8)
+            total_samples = frame_count * samples_per_frame
+
+            # LAME 拡張タグがあればエンコーダ遅延とパディングを差し引く
+            lame_pos = xing_pos + 8
+            for flag, size in ((0x01, 4), (0x02, 4), (0x04, 100), (0x08, 4)):
+                if flags & flag:
+                    lame_pos += size
+            if head[lame_pos:lame_pos + 4] in (b"LAME", b"Lavf", b"Lavc") and lame_pos + 24 <= len(head):
+                delay_padding = int.from_bytes(head[lame_pos + 21:lame_pos + 24], "big")
+                total_samples -= (delay_padding >> 12) + (delay_padding & 0xFFF)
+            return total_samples / sample_rate
+
+    # VBRI タグ（Fraunhofer エンコーダ）
+    vbri_pos = pos + 4 + 32
+    if head[vbri_pos:vbri_pos + 4] == b"VBRI":
+        frame_count, = struct.unpack_from(">I", head, vbri_pos + 14)
+        return frame_count * samples_per_frame / sample_rate
+
+    # タグがなければ CBR とみなしてファイルサイズから計算
+    f.seek(0, os.SEEK_END)
+    audio_end = f.tell()
+    f.seek(max(0, audio_end - 128))
+    if f.read(3) == b"TAG":
+        audio_end -= 128
+    return (audio_end - pos) * 8 / header["bitrate"]
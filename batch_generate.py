@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+譜面の一括生成
+ディレクトリ内の音楽ファイルごとに、ビート検出とパターン生成をプロセスプールで並列に行い、
+1回の解析から難易度ごとのバイナリ譜面（beatmap_format.py の形式）を書き出す。
+デフォルトの難易度は <曲名>.bin（ゲームが使う譜面）、その他は <曲名>.<難易度>.bin に保存する。
+
+音楽ファイルと生成パラメータが前回から変わっていない曲は読み飛ばす（manifest.json に記録）。
+デコード中の音声データが大きくなりすぎないよう、同時にデコードする曲の推定メモリ量に上限を設ける
+
+使い方:
+    python batch_generate.py                          # sample_music/ の曲を charts/ に生成
+    python batch_generate.py music_dir -o charts -j 4 --max-decode-mb 256
+    python batch_generate.py --force                  # 変更がなくても全て生成し直す
+    python batch_generate.py --stream                 # 曲の長さによらず全ての曲をストリーミング解析する
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from audio_probe import get_duration
+from beat_cache import BeatCache
+from beatmap_format import save_binary
+from chart_generator import (detect_beats, generate_charts, analysis_params, should_stream, chart_seed,
+                             DIFFICULTIES, DEFAULT_DIFFICULTY, ONSET_WEIGHT, GENERATOR_VERSION)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MUSIC_DIR = os.path.join(BASE_DIR, "sample_music")
+DEFAULT_OUTPUT_DIR = os.path.join(BASE_DIR, "charts")
+MANIFEST_FILE = "manifest.json"
+MUSIC_EXTENSIONS = (".mp3", ".ogg", ".wav")
+
+LANE_COUNT = 4
+DEFAULT_MUSIC_LENGTH = 180.0    # 音楽の長さが取得できない場合のデフォルト値（3分）
+DEFAULT_MAX_DECODE_MB = 512     # 同時にデコードする音声データの推定メモリ量の上限
+
+# デコード時のメモリ量の見積もり（1秒あたりのバイト数）
+# 元のサンプリング周波数のステレオ float32 と、リサンプル後のモノラル float32 とその作業領域
+DECODE_BYTES_PER_SECOND = 44100 * 2 * 4 + 22050 * 4 * 2
+# ストリーミング解析する曲は曲の長さによらず、1ブロック分の音声・スペクトログラムとテンポ推定の作業領域（約 40MB）だけを見込む
+STREAM_DECODE_BYTES = 48 * 1024 * 1024
+
+# ワーカープロセスで共有するデコードの使用量（ワーカーの初期化時に設定）
+_decode_condition = None
+_decode_bytes = None
+_max_decode_bytes = 0
+
+
+def _init_worker(condition, decode_bytes, max_decode_bytes):
+    """ワーカープロセスの初期化"""
+    global _decode_condition, _decode_bytes, _max_decode_bytes
+    _decode_condition = condition
+    _decode_bytes = decode_bytes
+    _max_decode_bytes = max_decode_bytes
+
+
+def _acquire_decode(size):
+    """デコードの使用量が上限に収まるまで待つ（他にデコード中の曲がなければ上限を超えても始める）"""
+    with _decode_condition:
+        while _decode_bytes.value > 0 and _decode_bytes.value + size > _max_decode_bytes:
+            _decode_condition.wait()
+        _decode_bytes.value += size
+
+
+def _release_decode(size):
+    """デコードの使用量を戻し、待っているワーカーを起こす"""
+    with _decode_condition:
+        _decode_bytes.value -= size
+        _decode_condition.notify_all()
+
+
+def track_params(seed, streaming):
+    """再生成が必要かどうかの判定に使うパラメータ"""
+    return dict(analysis_params(streaming), lane_count=LANE_COUNT, seed=seed, difficulties=DIFFICULTIES,
+                onset_weight=ONSET_WEIGHT, generator=GENERATOR_VERSION)
+
+
+def chart_files(music_file):
+    """曲の難易度ごとの譜面ファイル名"""
+    stem = os.path.splitext(music_file)[0]
+    return {difficulty: stem + ".bin" if difficulty == DEFAULT_DIFFICULTY else f"{stem}.{difficulty}.bin"
+            for difficulty in DIFFICULTIES}
+
+
+def generate_track(music_path, output_paths, seed, streaming):
+    """1曲分の難易度ごとの譜面を生成して書き出し、処理時間などをまとめて返す（ワーカープロセスで実行）
+
+    output_paths は難易度から出力先のパスへの辞書、streaming はストリーミング解析を使うかどうか
+    """
+    start = time.perf_counter()
+    music_file = os.path.basename(music_path)
+    beat_cache = BeatCache()
+
+    music_length = get_duration(music_path) or DEFAULT_MUSIC_LENGTH
+    wait_time = 0.0
+
+    # キャッシュにない曲はデコードするため、使用量の上限の範囲で順番を待つ
+    cached = beat_cache.get(music_path, analysis_params(streaming))
+    if cached is not None:
+        tempo, beat_times, beat_strengths = cached
+    else:
+        decode_size = STREAM_DECODE_BYTES if streaming else int(music_length * DECODE_BYTES_PER_SECOND)
+        _acquire_decode(decode_size)
+        wait_time = time.perf_counter() - start
+        try:
+            tempo, beat_times, beat_strengths, _ = detect_beats(music_path, beat_cache, streaming)
+        finally:
+            _release_decode(decode_size)
+    analysis_time = time.perf_counter() - start - wait_time
+
+    charts = generate_charts(beat_times, beat_strengths, music_length, LANE_COUNT, DIFFICULTIES, seed)
+    for difficulty, (lanes, times) in charts.items():
+        save_binary(output_paths[difficulty], times, lanes, music_file=music_file, duration=music_length, bpm=tempo)
+    return {
+        "notes": {difficulty: len(lanes) for difficulty, (lanes, _) in charts.items()},
+        "tempo": tempo,
+        "cached": cached is not None,
+        "wait_time": wait_time,
+        "analysis_time": analysis_time,
+        "total_time": time.perf_counter() - start,
+    }
+
+
+def load_manifest(output_dir):
+    """前回の生成結果の記録を読み込む"""
+    try:
+        with open(os.path.join(output_dir, MANIFEST_FILE), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(output_dir, manifest):
+    """生成結果の記録を保存する（書き込み途中で中断されても壊れないよう一時ファイルから置き換える）"""
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    temp_path = path + ".tmp"
+    with open(temp_path, "w") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(temp_path, path)
+
+
+def find_tracks(music_dir):
+    """ディレクトリ内の音楽ファイルを名前順に返す"""
+    return sorted(name for name in os.listdir(music_dir) if name.lower().endswith(MUSIC_EXTENSIONS))
+
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description="ディレクトリ内の音楽ファイルから譜面を一括生成します")
+    parser.add_argument("music_dir", nargs="?", default=DEFAULT_MUSIC_DIR, help="音楽ファイルのディレクトリ")
+    parser.add_argument("-o", "--output-dir", default=DEFAULT_OUTPUT_DIR, help="譜面の出力先ディレクトリ")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="並列に処理するプロセス数")
+    parser.add_argument("--max-decode-mb", type=float, default=DEFAULT_MAX_DECODE_MB,
+                        help="同時にデコードする音声データの推定メモリ量の上限（MB）")
+    parser.add_argument("--seed", type=int, default=0, help="パターン生成の乱数シード")
+    parser.add_argument("--force", action="store_true", help="変更がない曲も生成し直す")
+    parser.add_argument("--stream", action="store_true",
+                        help="曲の長さによらず、全ての曲をブロックごとに読み込んで解析する（メモリ使用量を抑える）")
+    args = parser.parse_args()
+
+    try:
+        tracks = find_tracks(args.music_dir)
+        os.makedirs(args.output_dir, exist_ok=True)
+    except OSError as e:
+        print(f"ディレクトリを開けません: {e}")
+        sys.exit(1)
+
+    # 音楽ファイルとパラメータが前回から変わっていない曲は読み飛ばす
+    manifest = load_manifest(args.output_dir)
+    tasks = []
+    for music_file in tracks:
+        music_path = os.path.join(args.music_dir, music_file)
+        charts = chart_files(music_file)
+        stat = os.stat(music_path)
+        seed = chart_seed(music_file, args.seed)
+        streaming = args.stream or should_stream(get_duration(music_path))
+        entry = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "params": track_params(seed, streaming),
+            "charts": charts,
+        }
+        previous = manifest.get(music_file)
+        if (not args.force and previous is not None and
+                {key: previous.get(key) for key in entry} == entry and
+                all(os.path.exists(os.path.join(args.output_dir, chart)) for chart in charts.values())):
+            continue
+        output_paths = {difficulty: os.path.join(args.output_dir, chart) for difficulty, chart in charts.items()}
+        tasks.append((music_file, music_path, output_paths, seed, streaming, entry))
+
+    skipped = len(tracks) - len(tasks)
+    print(f"{len(tracks)} 曲中 {len(tasks)} 曲の譜面を生成します（変更なし: {skipped} 曲）")
+    if not tasks:
+        return
+
+    start = time.perf_counter()
+    failed = 0
+    condition = multiprocessing.Condition()
+    decode_bytes = multiprocessing.Value("q", 0, lock=False)
+    with ProcessPoolExecutor(max_workers=max(1, args.jobs), initializer=_init_worker,
+                             initargs=(condition, decode_bytes, int(args.max_decode_mb * 1024 * 1024))) as executor:
+        futures = {executor.submit(generate_track, music_path, output_paths, seed, streaming): (music_file, entry)
+                   for music_file, music_path, output_paths, seed, streaming, entry in tasks}
+        for done, future in enumerate(as_completed(futures), 1):
+            music_file, entry = futures[future]
+            try:
+                result = future.result()
+            except ImportError:
+                failed += 1
+                print(f"[{done}/{len(tasks)}] {music_file}: librosaライブラリがインストールされていません")
+                continue
+            except Exception as e:
+                failed += 1
+                print(f"[{done}/{len(tasks)}] {music_file}: 失敗しました: {e}")
+                continue
+
+            source = "キャッシュ" if result["cached"] else "解析"
+            notes = ", ".join(f"{difficulty} {count}" for difficulty, count in result["notes"].items())
+            print(f"[{done}/{len(tasks)}] {music_file}: ノーツ数 {notes}, "
+                  f"テンポ {result['tempo']:.1f} BPM, {source} {result['analysis_time']:.2f}s, "
+                  f"待ち {result['wait_time']:.2f}s, 合計 {result['total_time']:.2f}s")
+
+            # 途中で中断しても生成済みの曲は次回読み飛ばせるよう、1曲ごとに記録する
+            manifest[music_file] = entry
+            try:
+                save_manifest(args.output_dir, manifest)
+            except OSError as e:
+                print(f"生成結果の記録に失敗しました: {e}")
+
+    print(f"完了: {len(tasks) - failed} 曲成功, {failed} 曲失敗, {time.perf_counter() - start:.2f}s")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
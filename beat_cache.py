@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ビート解析結果のディスクキャッシュ
+librosa によるビート検出結果（テンポ・ビート時刻・ビート位置のオンセット強度）を保存し、
+同じ音楽ファイルを同じパラメータで解析する場合は librosa を呼ばずに済ませる
+"""
+
+import os
+import sys
+import json
+import struct
+import hashlib
+from array import array
+
+# キャッシュ設定
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "beats")
+MAX_CACHE_BYTES = 16 * 1024 * 1024  # キャッシュ全体の上限（16MB）
+MAX_CACHE_ENTRIES = 1000            # キャッシュファイル数の上限
+CACHE_EXTENSION = ".beats"
+
+# キャッシュファイルのヘッダ（マジック, バージョン, テンポ, ビート数）
+# バージョン 2 からはビート時刻の後にオンセット強度を同じ数だけ保存する
+# （オンセット強度は譜面の生成結果を左右するため、バージョン 1 のエントリは使わずに解析し直す）
+CACHE_MAGIC = b"RGBC"
+CACHE_VERSION = 2
+HEADER = struct.Struct("<4sHdI")
+
+
+class BeatCache:
+    """ビート解析結果のキャッシュ"""
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES, max_entries=MAX_CACHE_ENTRIES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+
+    def make_key(self, audio_path, params):
+        """音楽ファイルのパス・サイズ・更新時刻と解析パラメータからキーを作成"""
+        stat = os.stat(audio_path)
+        source = json.dumps({
+            "path": os.path.abspath(audio_path),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "params": params,
+        }, sort_keys=True)
+        return hashlib.sha1(source.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key + CACHE_EXTENSION)
+
+    def get(self, audio_path, params):
+        """キャッシュを検索し、(テンポ, ビート時刻のリスト, オンセット強度のリスト) を返す。見つからなければ None"""
+        try:
+            entry_path = self._entry_path(self.make_key(audio_path, params))
+            with open(entry_path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+
+        try:
+            magic, version, tempo, count = HEADER.unpack_from(data)
+            if magic != CACHE_MAGIC or version != CACHE_VERSION:
+                return None
+            values = array("d")
+            values.frombytes(data[HEADER.size:HEADER.size + 2 * count * values.itemsize])
+            if len(values) != 2 * count:
+                return None
+            if sys.byteorder == "big":
+                values.byteswap()
+        except struct.error:
+            return None
+        beat_times = values[:count].tolist()
+        beat_strengths = values[count:].tolist()
+
+        # 最近使ったエントリとして更新時刻を進める（LRU用）
+        try:
+            os.utime(entry_path, None)
+        except OSError:
+            pass
+        return tempo, beat_times, beat_strengths
+
+    def put(self, audio_path, params, tempo, beat_times, beat_strengths=None):
+        """解析結果をキャッシュに保存する（オンセット強度が不明なら 0 として保存する）"""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            entry_path = self._entry_path(self.make_key(audio_path, params))
+
+            values = array("d", (float(t) for t in beat_times))
+            count = len(values)
+            if beat_strengths is None:
+                values.extend([0.0] * count)
+            else:
+                values.extend(float(s) for s in beat_strengths)
+            if sys.byteorder == "big":
+                values.byteswap()
+
+            # 書き込み途中のファイルを読まないよう、一時ファイルから置き換える
+            temp_path = entry_path + ".tmp"
+            with open(temp_path, "wb") as f:
+                f.write(HEADER.pack(CACHE_MAGIC, CACHE_VERSION, float(tempo), count))
+                f.write(values.tobytes())
+            os.replace(temp_path, entry_path)
+        except OSError as e:
+            print(f"ビート解析結果のキャッシュ保存に失敗しました: {e}")
+            return
+
+        self.evict()
+
+    def evict(self):
+        """上限を超えたキャッシュを古い順に削除する"""
+        try:
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                if name.endswith(CACHE_EXTENSION):
+                    path = os.path.join(self.cache_dir, name)
+                    stat = os.stat(path)
+                    entries.append((stat.st_mtime, stat.st_size, path))
+        except OSError:
+            return
+
+        entries.sort()
+        total_bytes = sum(size for _, size, _ in entries)
+        while entries and (total_bytes > self.max_bytes or len(entries) > self.max_entries):
+            _, size, path = entries.pop(0)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total_bytes -= size
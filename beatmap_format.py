@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+バイナリ譜面フォーマット
+譜面をヘッダ＋固定長レコードのバイナリで保存し、mmap と numpy.frombuffer で
+レコードごとの解析なしに読み込む。JSON（beatmap.json）は交換用フォーマットとして残し、
+このスクリプトで相互に変換できる。ゲーム・リプレイ・ベンチマークは load_chart で譜面を読み込む
+
+使い方:
+    python beatmap_format.py to-binary beatmap.json [beatmap.bin]
+    python beatmap_format.py to-json beatmap.bin [beatmap.json]
+
+ファイル構成（リトルエンディアン）:
+    ヘッダ    マジック "RGBM", バージョン, 音楽ファイル名の長さ, ノーツ数, 曲の長さ(秒), BPM,
+              タイミングポイント数（バージョン 2 から）
+    音楽ファイル名（UTF-8）
+    レコード  時間(float64, 秒), レーン(uint8) をノーツ数分
+    タイミングポイント  時間(float64, 秒), BPM(float64, 0 なら直前の BPM), スクロール速度(float64) を個数分
+
+JSON 譜面では "timing_points": [{"time": 秒, "bpm": BPM, "scroll": 倍率}, ...] で指定する
+（bpm と scroll は省略でき、省略した bpm は直前の値を引き継ぎ、scroll は 1.0 になる）
+"""
+
+import os
+import sys
+import json
+import mmap
+import struct
+import argparse
+
+import numpy as np
+
+from note_chart import NoteChart
+from timing_timeline import TimingTimeline
+
+BEATMAP_MAGIC = b"RGBM"
+BEATMAP_VERSION = 2
+HEADER_V1 = struct.Struct("<4sHHIdd")
+HEADER = struct.Struct("<4sHHIddI")
+RECORD_DTYPE = np.dtype([("time", "<f8"), ("lane", "u1")])
+TIMING_DTYPE = np.dtype([("time", "<f8"), ("bpm", "<f8"), ("scroll", "<f8")])
+
+
+class BeatmapFormatError(Exception):
+    """バイナリ譜面の形式が不正な場合のエラー"""
+
+
+def timing_points_from_json(items):
+    """JSON 譜面の timing_points を TIMING_DTYPE の配列にする"""
+    points = np.empty(len(items), dtype=TIMING_DTYPE)
+    for i, item in enumerate(items):
+        points[i] = (item["time"], item.get("bpm", 0.0), item.get("scroll", 1.0))
+    return points
+
+
+def save_binary(path, times, lanes, music_file="", duration=0.0, bpm=0.0, timing_points=None):
+    """ノーツ列をバイナリ譜面として保存する（ノーツは時間順に並べ替えて書き込む）
+
+    timing_points は TIMING_DTYPE の配列（なければ BPM 一定・スクロール速度 1.0）
+    """
+    times = np.asarray(times, dtype=np.float64)
+    lanes = np.asarray(lanes, dtype=np.uint8)
+    order = np.argsort(times, kind="stable")
+
+    records = np.empty(len(times), dtype=RECORD_DTYPE)
+    records["time"] = times[order]
+    records["lane"] = lanes[order]
+    timing_points = np.empty(0, dtype=TIMING_DTYPE) if timing_points is None else \
+        np.asarray(timing_points, dtype=TIMING_DTYPE)
+
+    music_file_bytes = music_file.encode("utf-8")
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(BEATMAP_MAGIC, BEATMAP_VERSION, len(music_file_bytes),
+                            len(records), float(duration), float(bpm), len(timing_points)))
+        f.write(music_file_bytes)
+        f.write(records.tobytes())
+        f.write(timing_points.tobytes())
+
+
+def load_binary(path):
+    """バイナリ譜面を読み込む。レコードはファイルをメモリマップした配列として返す（バージョン 1 も読める）"""
+    with open(path, "rb") as f:
+        file_size = os.fstat(f.fileno()).st_size
+        if file_size < HEADER_V1.size:
+            raise BeatmapFormatError(f"ヘッダが不完全です: {path}")
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, version = struct.unpack_from("<4sH", buffer)
+    if magic != BEATMAP_MAGIC:
+        raise BeatmapFormatError(f"バイナリ譜面ではありません: {path}")
+    if version == 1:
+        header = HEADER_V1
+        _, _, music_file_length, note_count, duration, bpm = header.unpack_from(buffer)
+        timing_count = 0
+    elif version == BEATMAP_VERSION:
+        header = HEADER
+        if file_size < header.size:
+            raise BeatmapFormatError(f"ヘッダが不完全です: {path}")
+        _, _, music_file_length, note_count, duration, bpm, timing_count = header.unpack_from(buffer)
+    else:
+        raise BeatmapFormatError(f"対応していないバージョンです: {version}")
+
+    records_offset = header.size + music_file_length
+    timing_offset = records_offset + note_count * RECORD_DTYPE.itemsize
+    if timing_offset + timing_count * TIMING_DTYPE.itemsize > file_size:
+        raise BeatmapFormatError(f"レコードが不完全です: {path}")
+
+    music_file = bytes(buffer[header.size:records_offset]).decode("utf-8")
+    records = np.frombuffer(buffer, dtype=RECORD_DTYPE, count=note_count, offset=records_offset)
+    timing_points = np.frombuffer(buffer, dtype=TIMING_DTYPE, count=timing_count, offset=timing_offset)
+    return {
+        "music_file": music_file,
+        "duration": duration,
+        "bpm": bpm,
+        "times": records["time"],
+        "lanes": records["lane"],
+        "timing_points": timing_points,
+    }
+
+
+def load_beatmap(path):
+    """譜面ファイル（.json または .bin）を読み込み、load_binary と同じ形の辞書を返す"""
+    if path.endswith(".bin"):
+        return load_binary(path)
+
+    with open(path, "r") as f:
+        beatmap_data = json.load(f)
+    notes = beatmap_data.get("notes", [])
+    return {
+        "music_file": beatmap_data.get("music_file") or "",
+        "duration": beatmap_data.get("duration") or 0.0,
+        "bpm": beatmap_data.get("bpm") or 0.0,
+        "times": np.array([note_data["time"] for note_data in notes], dtype=np.float64),
+        "lanes": np.array([note_data["lane"] for note_data in notes], dtype=np.uint8),
+        "timing_points": timing_points_from_json(beatmap_data.get("timing_points", [])),
+    }
+
+
+def chart_matches(music_file, music_path):
+    """譜面が曲に対応しているか（譜面に音楽ファイルの指定がなければどの曲にも使う）"""
+    return not music_file or music_file == os.path.basename(music_path)
+
+
+def load_chart(path, lane_count, music_path=None):
+    """譜面ファイル（.json または .bin）から、タイミングポイントのタイムラインを含む NoteChart を作る
+
+    music_path を指定すると、譜面に別の曲が指定されている場合は None を返す
+    """
+    beatmap = load_beatmap(path)
+    if music_path is not None and not chart_matches(beatmap["music_file"], music_path):
+        return None
+    timeline = TimingTimeline.from_records(beatmap["timing_points"], beatmap["bpm"])
+    return NoteChart(beatmap["lanes"], beatmap["times"], lane_count, timeline)
+
+
+def json_to_binary(json_path, binary_path):
+    """JSON 譜面をバイナリ譜面に変換する"""
+    beatmap = load_beatmap(json_path)
+    save_binary(binary_path, beatmap["times"], beatmap["lanes"], music_file=beatmap["music_file"],
+                duration=beatmap["duration"], bpm=beatmap["bpm"], timing_points=beatmap["timing_points"])
+    return len(beatmap["times"])
+
+
+def binary_to_json(binary_path, json_path):
+    """バイナリ譜面を JSON 譜面に変換する"""
+    beatmap = load_binary(binary_path)
+
+    beatmap_data = {}
+    if beatmap["music_file"]:
+        beatmap_data["music_file"] = beatmap["music_file"]
+    if beatmap["duration"]:
+        beatmap_data["duration"] = beatmap["duration"]
+    if beatmap["bpm"]:
+        beatmap_data["bpm"] = beatmap["bpm"]
+    if len(beatmap["timing_points"]):
+        beatmap_data["timing_points"] = [{"time": time, "bpm": bpm, "scroll": scroll}
+                                         for time, bpm, scroll in beatmap["timing_points"].tolist()]
+    beatmap_data["notes"] = [{"time": time, "lane": lane}
+                             for time, lane in zip(beatmap["times"].tolist(), beatmap["lanes"].tolist())]
+
+    with open(json_path, "w") as f:
+        json.dump(beatmap_data, f, ensure_ascii=False, indent=2)
+    return len(beatmap_data["notes"])
+
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description="譜面ファイルを JSON とバイナリの間で変換します")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    to_binary = subparsers.add_parser("to-binary", help="JSON 譜面をバイナリ譜面に変換")
+    to_binary.add_argument("input", help="入力 JSON ファイル")
+    to_binary.add_argument("output", nargs="?", help="出力ファイル（省略時は拡張子を .bin に変更）")
+
+    to_json = subparsers.add_parser("to-json", help="バイナリ譜面を JSON 譜面に変換")
+    to_json.add_argument("input", help="入力バイナリファイル")
+    to_json.add_argument("output", nargs="?", help="出力ファイル（省略時は拡張子を .json に変更）")
+
+    args = parser.parse_args()
+
+    try:
+        if args.command == "to-binary":
+            output = args.output or os.path.splitext(args.input)[0] + ".bin"
+            count = json_to_binary(args.input, output)
+        else:
+            output = args.output or os.path.splitext(args.input)[0] + ".json"
+            count = binary_to_json(args.input, output)
+    except (OSError, ValueError, KeyError, BeatmapFormatError) as e:
+        print(f"譜面ファイルの変換に失敗しました: {e}")
+        sys.exit(1)
+
+    print(f"{count} 個のノーツを {output} に書き出しました")
+
+
+if __name__ == "__main__":
+    main()
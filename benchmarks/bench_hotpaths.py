@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ホットパスのベンチマーク
+1k/10k/100k ノーツの合成譜面で、以下をそれぞれ測定する
+    - judge_note: キー入力1回あたりの判定時間
+    - check_missed_notes: 1フレームあたりの見逃し判定時間
+    - draw_playing_screen: 1フレームあたりの描画時間（SDL のダミードライバを使用）
+    - chart_load_json / chart_load_bin: テンポ変化のある譜面（JSON / バイナリ）の読み込み時間（ゲームと同じ読み込み処理）
+結果は p50/p95/p99 で表示し、--output を指定すると JSON に保存する。--compare で以前の結果と比較できる
+
+使い方:
+    python benchmarks/bench_hotpaths.py
+    python benchmarks/bench_hotpaths.py --sizes 1000 10000 --output before.json
+    python benchmarks/bench_hotpaths.py --compare before.json
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import subprocess
+
+# 画面・音声なしで pygame を使う
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import numpy as np
+
+from game_engine import JudgeEngine, autoplay_inputs, synthetic_chart
+from beatmap_format import load_chart, save_binary, TIMING_DTYPE
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+FPS = 60
+DRAW_FRAMES = 600       # 描画を測定するフレーム数
+LOAD_REPEATS = 5        # 譜面読み込みの繰り返し回数
+INPUT_JITTER = 0.04     # 判定の測定に使う入力のばらつき（秒）
+
+
+def summarize(samples_ns):
+    """測定値（ナノ秒）を統計値（マイクロ秒）にまとめる"""
+    samples = np.asarray(samples_ns, dtype=np.float64) / 1000.0
+    return {
+        "count": int(len(samples)),
+        "mean_us": float(samples.mean()),
+        "p50_us": float(np.percentile(samples, 50)),
+        "p95_us": float(np.percentile(samples, 95)),
+        "p99_us": float(np.percentile(samples, 99)),
+    }
+
+
+def attach_chart(game, notes):
+    """ゲーム（なければ判定エンジンのみ）に譜面を設定し、判定と見逃し判定の関数を返す"""
+    engine = JudgeEngine(notes)
+    if game is None:
+        return engine.judge, engine.sweep_misses
+    game.notes = notes
+    game.engine = engine
+    return game.judge_note, game.check_missed_notes
+
+
+def bench_judge(game, notes):
+    """キー入力1回あたりの判定時間を測定する"""
+    judge_note, _ = attach_chart(game, notes)
+    samples = []
+    for song_time, lane in autoplay_inputs(notes, jitter=INPUT_JITTER, seed=1):
+        start = time.perf_counter_ns()
+        judge_note(lane, song_time)
+        samples.append(time.perf_counter_ns() - start)
+    return summarize(samples)
+
+
+def bench_miss_check(game, notes):
+    """入力なしで曲を最後まで進め、1フレームあたりの見逃し判定時間を測定する"""
+    _, check_missed_notes = attach_chart(game, notes)
+    end_time = float(notes.time[-1]) + 1.0
+    samples = []
+    for frame in range(int(end_time * FPS)):
+        song_time = frame / FPS
+        start = time.perf_counter_ns()
+        check_missed_notes(song_time)
+        samples.append(time.perf_counter_ns() - start)
+    return summarize(samples)
+
+
+def bench_draw(game, notes):
+    """曲全体から均等に選んだフレームで描画時間を測定する"""
+    attach_chart(game, notes)
+    samples = []
+    for song_time in np.linspace(0.0, float(notes.time[-1]), DRAW_FRAMES).tolist():
+        start = time.perf_counter_ns()
+        game.draw_playing_screen(song_time)
+        samples.append(time.perf_counter_ns() - start)
+    return summarize(samples)
+
+
+def benchmark_timing_points(duration, count=64):
+    """曲全体に均等に置いた、テンポとスクロール速度の変化するタイミングポイント"""
+    points = np.empty(count, dtype=TIMING_DTYPE)
+    points["time"] = np.linspace(0.0, duration, count, endpoint=False)
+    points["bpm"] = np.where(np.arange(count) % 2 == 0, 120.0, 180.0)
+    points["scroll"] = np.where(np.arange(count) % 3 == 0, 0.5, 1.0)
+    return points
+
+
+def write_benchmark_charts(notes, temp_dir):
+    """同じ譜面を JSON とバイナリで書き出し、{形式: パス} を返す"""
+    duration = float(notes.time[-1]) + 1.0
+    timing_points = benchmark_timing_points(duration)
+    json_file = os.path.join(temp_dir, "beatmap.json")
+    with open(json_file, "w") as f:
+        json.dump({
+            "music_file": "benchmark.mp3",
+            "duration": duration,
+            "bpm": 120.0,
+            "timing_points": [{"time": float(t), "bpm": float(b), "scroll": float(s)}
+                              for t, b, s in timing_points.tolist()],
+            "notes": [{"lane": lane, "time": note_time}
+                      for lane, note_time in zip(notes.lane.tolist(), notes.time.tolist())],
+        }, f)
+    binary_file = os.path.join(temp_dir, "beatmap.bin")
+    save_binary(binary_file, notes.time, notes.lane, "benchmark.mp3", duration, 120.0, timing_points)
+    return {"json": json_file, "bin": binary_file}
+
+
+def bench_load(notes):
+    """ゲームと同じ読み込み処理（beatmap_format.load_chart）で、JSON とバイナリの譜面の読み込み時間を測定する"""
+    results = {}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for kind, path in write_benchmark_charts(notes, temp_dir).items():
+            samples = []
+            for _ in range(LOAD_REPEATS):
+                start = time.perf_counter_ns()
+                chart = load_chart(path, notes.lane_count, "benchmark.mp3")
+                samples.append(time.perf_counter_ns() - start)
+            assert chart is not None and len(chart) == len(notes)
+            results[f"chart_load_{kind}"] = summarize(samples)
+    return results
+
+
+def create_game(temp_dir):
+    """描画の測定に使うゲームを作成する（曲のライブラリとビート解析のキャッシュは temp_dir に置き、
+    ユーザーのライブラリには書き込まない）"""
+    import rhythm_game
+    from beat_cache import BeatCache
+    from song_library import SongLibrary
+    library = SongLibrary(charts_dir=os.path.join(temp_dir, "charts"),
+                          library_file=os.path.join(temp_dir, "library.sqlite3"))
+    game = rhythm_game.RhythmGame(song_library=library, beat_cache=BeatCache(os.path.join(temp_dir, "beats")))
+    game.chart_ready.wait()
+    return game
+
+
+def git_revision():
+    """現在のリビジョンを返す（取得できなければ None）"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, baseline=None):
+    """結果を表形式で表示する（baseline があれば p50 の比も表示）"""
+    for size, metrics in results.items():
+        print(f"\n== {size} ノーツ ==")
+        for name, stats in metrics.items():
+            line = (f"  {name:<20} p50 {stats['p50_us']:>10.1f} us  p95 {stats['p95_us']:>10.1f} us"
+                    f"  p99 {stats['p99_us']:>10.1f} us  (n={stats['count']})")
+            base = (baseline or {}).get(size, {}).get(name)
+            if base and base["p50_us"] > 0:
+                line += f"  x{stats['p50_us'] / base['p50_us']:.2f}"
+            print(line)
+
+
+def run_benchmarks(game, sizes):
+    """各ノーツ数の合成譜面で測定し、{ノーツ数: {測定項目: 統計値}} を返す"""
+    results = {}
+    for size in sizes:
+        print(f"{size} ノーツの譜面を測定しています...")
+        notes = synthetic_chart(size, seed=size)
+        metrics = {
+            "judge_note": bench_judge(game, notes),
+            "check_missed_notes": bench_miss_check(game, notes),
+        }
+        if game is not None:
+            metrics["draw_playing_screen"] = bench_draw(game, notes)
+        metrics.update(bench_load(notes))
+        results[str(size)] = metrics
+    return results
+
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description="判定・見逃し判定・描画・譜面読み込みのベンチマーク")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="譜面のノーツ数")
+    parser.add_argument("--output", help="結果を保存する JSON ファイル（省略時は保存しない）")
+    parser.add_argument("--compare", help="比較対象の結果 JSON ファイル")
+    parser.add_argument("--skip-draw", action="store_true",
+                        help="ゲームを起動せず、判定エンジンのみを測定する（描画の測定は省略）")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        game = None if args.skip_draw else create_game(temp_dir)
+        results = run_benchmarks(game, args.sizes)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)["results"]
+    print_results(results, baseline)
+
+    if not args.output:
+        return
+    report = {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n結果を {args.output} に保存しました")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+起動時間のベンチマーク
+新しいプロセスでゲームを起動して最初のフレームを表示するまでを繰り返し測定し、
+区間ごと（モジュールの読み込み・pygame の初期化・画面・フォント・初期化・最初のフレーム）の中央値と、
+python -X importtime による読み込みに時間のかかるモジュールを表示する。
+合計の中央値が目標時間（startup_timer.STARTUP_BUDGET）を超えた場合は終了コード 1 を返す
+
+使い方:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 10 --output startup.json
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import numpy as np
+
+from startup_timer import STARTUP_BUDGET
+
+# 子プロセスで実行するスクリプト（最初のフレームを表示したら終了する）
+CHILD_SCRIPT = """
+import json
+import rhythm_game
+import pygame
+game = rhythm_game.RhythmGame()
+pygame.event.post(pygame.event.Event(pygame.QUIT))
+try:
+    game.run()
+except SystemExit:
+    pass
+print("STARTUP " + json.dumps(game.startup_timer.as_dict()))
+"""
+
+
+def child_env():
+    """画面・音声なしで起動するための環境変数"""
+    env = dict(os.environ)
+    env.setdefault("SDL_VIDEODRIVER", "dummy")
+    env.setdefault("SDL_AUDIODRIVER", "dummy")
+    env["PYTHONPATH"] = ROOT_DIR + os.pathsep + env.get("PYTHONPATH", "")
+    return env
+
+
+def measure_startup():
+    """ゲームを1回起動し、区間ごとの時間（ミリ秒）を返す"""
+    output = subprocess.run([sys.executable, "-c", CHILD_SCRIPT], cwd=ROOT_DIR, env=child_env(),
+                            capture_output=True, text=True, check=True).stdout
+    for line in output.splitlines():
+        if line.startswith("STARTUP "):
+            return json.loads(line[len("STARTUP "):])
+    raise RuntimeError("起動時間を取得できませんでした")
+
+
+def slowest_imports(count):
+    """python -X importtime で、読み込みに時間のかかるモジュールを (モジュール名, 累積ミリ秒) で返す"""
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", "import rhythm_game"], cwd=ROOT_DIR,
+                            env=child_env(), capture_output=True, text=True, check=True).stderr
+    imports = []
+    for line in stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            imports.append((parts[2].rstrip(), int(parts[1]) / 1000))
+    imports.sort(key=lambda item: item[1], reverse=True)
+    return imports[:count]
+
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description="ゲームの起動時間を測定します")
+    parser.add_argument("--runs", type=int, default=5, help="起動する回数")
+    parser.add_argument("--imports", type=int, default=15, help="表示するモジュールの数")
+    parser.add_argument("--output", help="結果を保存する JSON ファイル")
+    args = parser.parse_args()
+
+    runs = [measure_startup() for _ in range(args.runs)]
+    phases = {name: float(np.median([run.get(name, 0.0) for run in runs])) for name in runs[0]}
+    total = float(np.median([sum(run.values()) for run in runs]))
+
+    print(f"起動時間（{args.runs} 回の中央値）:")
+    for name, elapsed in phases.items():
+        print(f"  {name:<12} {elapsed:8.1f} ms")
+    print(f"  {'合計':<10} {total:8.1f} ms（目標 {STARTUP_BUDGET * 1000:.0f} ms）")
+
+    imports = slowest_imports(args.imports)
+    print("\n読み込みに時間のかかるモジュール（累積）:")
+    for module, elapsed in imports:
+        print(f"  {elapsed:8.1f} ms  {module}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"phases_ms": phases, "total_ms": total, "budget_ms": STARTUP_BUDGET * 1000,
+                       "imports_ms": imports}, f, ensure_ascii=False, indent=2)
+
+    if total > STARTUP_BUDGET * 1000:
+        print("\n起動時間が目標を超えています")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
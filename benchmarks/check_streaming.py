@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ストリーミング解析の確認
+音楽ファイルごとに、曲全体を読み込む解析（librosa.onset.onset_strength）とブロックごとのストリーミング解析で
+ビートを検出し、結果が許容範囲内で一致するかを調べる。キャッシュは使わない。
+chart_generator.py の解析の方法を変更したときは、このスクリプトで全ての曲が一致することを確かめる。
+一致しない曲があれば終了コード 1 を返す
+
+判定の基準:
+    ビート時刻   全体を読み込む解析のビートのうち BEAT_MATCH_RATE 以上に、
+                 BEAT_TIME_TOLERANCE 秒以内のストリーミング解析のビートがあること（逆向きも同じ）
+    テンポ       差が TEMPO_TOLERANCE（比率）以内であること
+
+使い方:
+    python benchmarks/check_streaming.py                 # sample_music/ の全ての曲
+    python benchmarks/check_streaming.py song1.mp3 song2.mp3
+"""
+
+import os
+import sys
+import argparse
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import numpy as np
+
+from chart_generator import _detect_beats_offline, _detect_beats_streaming
+
+MUSIC_DIR = os.path.join(ROOT_DIR, "sample_music")
+MUSIC_EXTENSIONS = (".mp3", ".ogg", ".wav")
+
+BEAT_TIME_TOLERANCE = 0.05  # ビート時刻の許容誤差（秒、22050 Hz・ホップ長 512 で約2フレーム）
+BEAT_MATCH_RATE = 0.95      # 許容誤差内に対応するビートがあるべき割合
+TEMPO_TOLERANCE = 0.02      # テンポの許容誤差（比率）
+
+
+def match_rate(reference, candidate, tolerance):
+    """reference の各ビートについて、tolerance 秒以内に candidate のビートがある割合"""
+    reference = np.asarray(reference, dtype=np.float64)
+    candidate = np.asarray(candidate, dtype=np.float64)
+    if len(reference) == 0:
+        return 1.0 if len(candidate) == 0 else 0.0
+    if len(candidate) == 0:
+        return 0.0
+    positions = np.searchsorted(candidate, reference)
+    after = candidate[np.minimum(positions, len(candidate) - 1)]
+    before = candidate[np.maximum(positions - 1, 0)]
+    nearest = np.minimum(np.abs(after - reference), np.abs(before - reference))
+    return float(np.mean(nearest <= tolerance))
+
+
+def check_file(music_path):
+    """1曲を2つの方法で解析して比べ、(一致したか, 結果の説明) を返す"""
+    offline_tempo, offline_beats, _ = _detect_beats_offline(music_path)
+    streaming_tempo, streaming_beats, _ = _detect_beats_streaming(music_path)
+
+    forward = match_rate(offline_beats, streaming_beats, BEAT_TIME_TOLERANCE)
+    backward = match_rate(streaming_beats, offline_beats, BEAT_TIME_TOLERANCE)
+    tempo_error = abs(streaming_tempo - offline_tempo) / offline_tempo if offline_tempo else float("inf")
+    passed = forward >= BEAT_MATCH_RATE and backward >= BEAT_MATCH_RATE and tempo_error <= TEMPO_TOLERANCE
+    summary = (f"ビート {len(offline_beats)}/{len(streaming_beats)}, 一致 {forward * 100:.1f}%/{backward * 100:.1f}%, "
+               f"テンポ {offline_tempo:.1f}/{streaming_tempo:.1f} BPM")
+    return passed, summary
+
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description="ストリーミング解析と曲全体を読み込む解析の結果を比べます")
+    parser.add_argument("files", nargs="*", help="音楽ファイル（省略時は sample_music/ の全ての曲）")
+    args = parser.parse_args()
+
+    files = args.files or [os.path.join(MUSIC_DIR, name) for name in sorted(os.listdir(MUSIC_DIR))
+                           if name.lower().endswith(MUSIC_EXTENSIONS)]
+    failed = 0
+    for music_path in files:
+        try:
+            passed, summary = check_file(music_path)
+        except ImportError:
+            print("librosaライブラリがインストールされていません。")
+            sys.exit(1)
+        except Exception as e:
+            passed, summary = False, f"解析に失敗しました: {e}"
+        failed += not passed
+        print(f"{'OK ' if passed else 'NG '} {os.path.basename(music_path)}: {summary}")
+
+    print(f"\n{len(files) - failed}/{len(files)} 曲が一致しました（許容誤差 {BEAT_TIME_TOLERANCE * 1000:.0f} ms, "
+          f"{BEAT_MATCH_RATE * 100:.0f}% 以上, テンポ {TEMPO_TOLERANCE * 100:.0f}% 以内）")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
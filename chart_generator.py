@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+音楽ファイルからの譜面生成
+librosa でビートとビート位置のオンセット強度を検出し（結果は BeatCache に保存）、
+ビートの位置にパターンを当てはめて難易度ごとのノーツ列を作る。
+ゲーム本体と一括生成スクリプト（batch_generate.py）の両方から使う
+"""
+
+import zlib
+
+import numpy as np
+
+from audio_probe import get_duration
+
+# ビート解析の設定（librosa のデフォルト値）
+BEAT_ANALYSIS_SR = 22050
+BEAT_ANALYSIS_HOP_LENGTH = 512
+BEAT_ANALYSIS_N_FFT = 2048
+
+# ストリーミング解析の設定（長い曲は全体を読み込まず、ブロックごとにオンセット強度を求める）
+# この長さ（秒）以上の曲はストリーミング解析する（None なら常に全体を読み込む）。
+# 全体を読み込む解析は 11 分の曲で約 400 MB、ストリーミング解析は曲の長さによらず約 40 MB（時間は約2.5倍）。
+# 結果が一致することは benchmarks/check_streaming.py で確かめる（sample_music/ の全ての曲でビート時刻が一致）
+STREAMING_MIN_DURATION = 300.0
+STREAM_BLOCK_FRAMES = 256       # 1ブロックのフレーム数（約6秒）
+ONSET_TOP_DB = 80.0             # オンセット強度の計算で使う dB の下限（最大値からの差）
+# ブロックを読み込むときに前のブロックと重ねて読むサンプル数（MP3 の8フレーム分）。
+# libsndfile は MP3 を少しずつ読むと、読み込みの境目の直後の数百サンプルが乱れることがあるため、
+# 手前から読み直して重なった部分を捨てる
+STREAM_READ_OVERLAP = 1152 * 8
+TEMPO_CHUNK_FRAMES = 2048       # テンポ推定で一度に求めるテンポグラムのフレーム数
+
+# 譜面生成の設定
+CHART_START_TIME = 2.0      # 最初の数秒は除外（イントロ部分）
+CHART_END_MARGIN = 1.0      # 曲の終わりの何秒前までノーツを置くか
+NOTE_PLACEMENT_RATE = 0.7   # その他のビートにノーツを置く割合（normal）
+ONSET_WEIGHT = 0.5          # ノーツを置くビートを選ぶときのオンセット強度の重み（0 なら完全にランダム）
+GENERATOR_VERSION = 3       # パターンの規則を変えたら上げる（一括生成の再生成判定に使う）
+
+# 難易度ごとの、その他のビートにノーツを置く割合（低い難易度のノーツは高い難易度にも必ず含まれる）
+DIFFICULTIES = {
+    "easy": 0.35,
+    "normal": NOTE_PLACEMENT_RATE,
+    "hard": 1.0,
+}
+DEFAULT_DIFFICULTY = "normal"
+
+
+def should_stream(music_length):
+    """曲の長さ（秒、不明なら None）からストリーミング解析を使うかどうかを決める"""
+    return (STREAMING_MIN_DURATION is not None and music_length is not None and
+            music_length >= STREAMING_MIN_DURATION)
+
+
+def analysis_params(streaming=False):
+    """ビート解析のパラメータ（キャッシュのキーに使う）"""
+    params = {"sr": BEAT_ANALYSIS_SR, "hop_length": BEAT_ANALYSIS_HOP_LENGTH}
+    if streaming:
+        params["streaming"] = STREAM_BLOCK_FRAMES
+    return params
+
+
+def chart_seed(music_file, seed=0):
+    """曲ごとの乱数シード（同じ曲とシードなら毎回同じ譜面になる）"""
+    return zlib.crc32(music_file.encode("utf-8")) ^ seed
+
+
+def detect_beats(music_path, beat_cache=None, streaming=None):
+    """音楽ファイルのビートを検出し、(テンポ, ビート時刻のリスト, オンセット強度のリスト, キャッシュから読んだか) を返す
+
+    オンセット強度はビートの位置での値。streaming が None なら曲の長さで決める。librosa はキャッシュにない場合だけ読み込む
+    （インストールされていなければ ImportError）
+    """
+    if streaming is None:
+        streaming = should_stream(get_duration(music_path))
+    params = analysis_params(streaming)
+    if beat_cache is not None:
+        cached = beat_cache.get(music_path, params)
+        if cached is not None:
+            tempo, beat_times, beat_strengths = cached
+            return tempo, beat_times, beat_strengths, True
+
+    import librosa
+
+    tempo = beat_times = beat_strengths = None
+    if streaming:
+        try:
+            tempo, beat_times, beat_strengths = _detect_beats_streaming(music_path)
+        except Exception as e:
+            # soundfile が読めない形式などは、全体を読み込む方法で解析する
+            print(f"ストリーミング解析に失敗したため、曲全体を読み込んで解析します: {e}")
+            # 全体を読み込んだ結果はストリーミング解析の結果として保存しない
+            params = analysis_params(False)
+            if beat_cache is not None:
+                cached = beat_cache.get(music_path, params)
+                if cached is not None:
+                    tempo, beat_times, beat_strengths = cached
+                    return tempo, beat_times, beat_strengths, True
+
+    if beat_times is None:
+        tempo, beat_times, beat_strengths = _detect_beats_offline(music_path)
+
+    # 解析結果をキャッシュに保存
+    if beat_cache is not None:
+        beat_cache.put(music_path, params, tempo, beat_times, beat_strengths)
+    return tempo, beat_times, beat_strengths, False
+
+
+def _track_beats(onset_envelope):
+    """オンセット強度からテンポとビートを検出し、(テンポ, ビート時刻のリスト, オンセット強度のリスト) を返す
+
+    librosa.beat.beat_track はテンポの推定で曲全体のテンポグラム（8秒の窓 × フレーム数）を作るため、
+    10分の曲では数百 MB になる。テンポの推定に使うのはテンポグラムの時間方向の平均だけなので、
+    TEMPO_CHUNK_FRAMES ずつ求めて足し合わせ、librosa.feature.tempo に渡してから beat_track にテンポを指定する
+    （結果は beat_track にテンポを推定させた場合と同じ）
+    """
+    import librosa
+
+    sr, hop_length = BEAT_ANALYSIS_SR, BEAT_ANALYSIS_HOP_LENGTH
+    win_length = librosa.time_to_frames(8.0, sr=sr, hop_length=hop_length).item()
+    # 中心合わせ（center=True）と同じ端の処理をしておき、フレームごとの窓を center=False で切り出す
+    padded = np.pad(onset_envelope, win_length // 2, mode="linear_ramp", end_values=[0, 0])
+    frame_count = len(onset_envelope)
+    total = np.zeros(win_length)
+    for start in range(0, frame_count, TEMPO_CHUNK_FRAMES):
+        stop = min(start + TEMPO_CHUNK_FRAMES, frame_count)
+        tempogram = librosa.feature.tempogram(onset_envelope=padded[start:stop - 1 + win_length], sr=sr,
+                                              hop_length=hop_length, win_length=win_length, center=False)
+        total += tempogram.sum(axis=1)
+    mean_tempogram = (total / max(frame_count, 1))[:, np.newaxis]
+    tempo = float(librosa.feature.tempo(tg=mean_tempogram, sr=sr, hop_length=hop_length)[0])
+
+    _, beat_frames = librosa.beat.beat_track(onset_envelope=onset_envelope, sr=sr, hop_length=hop_length,
+                                             bpm=tempo)
+    beat_times = librosa.frames_to_time(beat_frames, sr=sr, hop_length=hop_length).tolist()
+    return tempo, beat_times, onset_envelope[beat_frames].tolist()
+
+
+def _detect_beats_offline(music_path):
+    """曲全体を読み込んで解析し、(テンポ, ビート時刻のリスト, オンセット強度のリスト) を返す"""
+    import librosa
+
+    # 音楽ファイルを読み込む
+    y, sr = librosa.load(music_path, sr=BEAT_ANALYSIS_SR)
+
+    # ビート検出（オンセット強度はパターン生成でも使うため先に求める）
+    onset_envelope = librosa.onset.onset_strength(y=y, sr=sr, hop_length=BEAT_ANALYSIS_HOP_LENGTH)
+    del y  # ビートの検出中は音声を持たない
+    return _track_beats(onset_envelope)
+
+
+def _stream_mel_db(music_path):
+    """曲をブロックごとに読み込み、ブロックごとのメルスペクトログラム（dB、下限なし）を返すジェネレータ
+
+    librosa.load と同じく、モノラルにしてから soxr（HQ）で BEAT_ANALYSIS_SR にリサンプルする。
+    ブロックの境目で結果が変わらないよう、各ブロックは STREAM_READ_OVERLAP だけ手前から読んで重なりを捨て、
+    状態を持つ soxr.ResampleStream でつなげてリサンプルし、
+    フレームに切り出していない残りのサンプルは次のブロックに持ち越す。
+    曲の前後には中心合わせ（center=True）と同じく窓の半分の無音を付けるので、
+    フレームの位置と数は librosa.feature.melspectrogram と同じになる
+    """
+    import librosa
+    import soundfile
+    import soxr
+
+    n_fft, hop_length = BEAT_ANALYSIS_N_FFT, BEAT_ANALYSIS_HOP_LENGTH
+    with soundfile.SoundFile(music_path) as f:
+        sr = f.samplerate
+        resampler = soxr.ResampleStream(sr, BEAT_ANALYSIS_SR, 1, dtype="float32") if sr != BEAT_ANALYSIS_SR else None
+        block_size = max(1, STREAM_BLOCK_FRAMES * hop_length * sr // BEAT_ANALYSIS_SR)
+        pending = np.zeros(n_fft // 2, dtype=np.float32)  # フレームに切り出していないサンプル
+        read_samples = 0     # 読み込んだサンプル数（元のサンプリング周波数）
+        output_samples = 0   # リサンプル後のサンプル数
+        last = False
+        while not last:
+            start = max(read_samples - STREAM_READ_OVERLAP, 0)
+            f.seek(start)
+            block = f.read(read_samples - start + block_size, dtype="float32", always_2d=True)
+            block = block[read_samples - start:]
+            last = len(block) < block_size
+            read_samples += len(block)
+            y = block.mean(axis=1)
+            if resampler is not None:
+                y = resampler.resample_chunk(y, last=last)
+            output_samples += len(y)
+            pending = np.concatenate([pending, y])
+
+            if last:
+                # librosa.resample と同じ長さにそろえ（soxr の出力は数サンプルずれることがある）、窓の半分の無音を付ける
+                expected = int(np.ceil(read_samples * BEAT_ANALYSIS_SR / sr))
+                excess = output_samples - expected
+                if excess > 0:
+                    pending = pending[:len(pending) - excess]
+                pending = np.concatenate([pending, np.zeros(max(-excess, 0) + n_fft // 2, dtype=np.float32)])
+
+            frame_count = 1 + (len(pending) - n_fft) // hop_length if len(pending) >= n_fft else 0
+            if frame_count == 0:
+                continue
+            mel = librosa.feature.melspectrogram(y=pending[:(frame_count - 1) * hop_length + n_fft],
+                                                 sr=BEAT_ANALYSIS_SR, n_fft=n_fft, hop_length=hop_length,
+                                                 center=False)
+            pending = pending[frame_count * hop_length:]
+            yield librosa.power_to_db(mel, top_db=None)
+
+
+def _detect_beats_streaming(music_path):
+    """曲をブロックごとに読み込んでオンセット強度を求め、(テンポ, ビート時刻のリスト, オンセット強度のリスト) を返す
+
+    メモリに置くのは1ブロック分の音声と、1フレームあたり1つの値のオンセット強度だけなので、
+    曲が長くなってもほとんど増えない。メルスペクトログラムは曲全体を読み込む場合と同じものを求める（_stream_mel_db）。
+    librosa.onset.onset_strength は曲全体の最大値から ONSET_TOP_DB 下を下限にするので、
+    1回目の読み込みで曲全体の最大値を求め、2回目の読み込みで全てのブロックに同じ下限を使う
+    （デコードは2回になる）。全体を読み込む解析との差は benchmarks/check_streaming.py で確かめる
+    """
+    hop_length, n_fft = BEAT_ANALYSIS_HOP_LENGTH, BEAT_ANALYSIS_N_FFT
+
+    # 1回目: 曲全体の最大値（dB の下限を決める）
+    max_db = max((float(mel_db.max()) for mel_db in _stream_mel_db(music_path)), default=0.0)
+    floor_db = max_db - ONSET_TOP_DB
+
+    # 2回目: 全てのブロックに同じ下限を使ってオンセット強度を求める
+    envelopes = []
+    previous = None      # 前のブロックの最後のフレーム（ブロックの境目の差分に使う）
+    frame_count = 0
+    for mel_db in _stream_mel_db(music_path):
+        frame_count += mel_db.shape[1]
+        mel_db = np.maximum(mel_db, floor_db)
+
+        # 前のフレームからの増加量をメル帯域で平均する（librosa.onset.onset_strength と同じ）
+        if previous is not None:
+            mel_db = np.concatenate([previous, mel_db], axis=1)
+        if mel_db.shape[1] > 1:
+            envelopes.append(np.maximum(0.0, np.diff(mel_db, axis=1)).mean(axis=0))
+        previous = mel_db[:, -1:]
+
+    # librosa.onset.onset_strength と同じく、先頭に差分の遅れと窓の半分を詰めてフレーム数に切りそろえる
+    padding = np.zeros(1 + n_fft // (2 * hop_length))
+    onset_envelope = np.concatenate([padding] + envelopes)[:frame_count]
+    return _track_beats(onset_envelope)
+
+
+def generate_charts(beat_times, beat_strengths, music_length, lane_count, difficulties=DIFFICULTIES, seed=0):
+    """1回の解析結果から難易度ごとの譜面を作り、{難易度: (レーンの配列, 時間の配列)} を返す
+
+    ビートの番号 i（最初の CHART_START_TIME 秒を除いて数える）ごとに次の規則でノーツを置く。
+      - 16ビートごとに全レーン
+      - 8ビートごとに対角線（(i // 8) % lane_count のレーン）
+      - 4ビートごとに交互の2レーン
+      - その他のビートは直前のノーツと違うレーンにランダムに1つ（難易度ごとの割合のビートだけ）
+    その他のビートはオンセット強度が強いものほど選ばれやすく、低い難易度で選ばれたビートは高い難易度でも選ばれる。
+    レーンが4つ以上なら、4ビートの区切りごとに区切りのレーンとも互いにも重ならないレーンを選んでおくので、
+    どのビートが選ばれても直前と同じレーンにならず、低い難易度のノーツは高い難易度にも同じレーンで含まれる。
+    乱数は全ての難易度で共有して1度だけ引くため、同じ seed なら難易度の組み合わせによらず同じ譜面になる。
+    beat_strengths が None なら全てのビートを同じ強さとして扱う
+    """
+    rng = np.random.default_rng(seed)
+    beat_times = np.asarray(beat_times, dtype=np.float64)
+    strengths = np.zeros(len(beat_times)) if beat_strengths is None else np.asarray(beat_strengths, dtype=np.float64)
+
+    # 最初の数秒（イントロ部分）と曲の終わりを除外
+    in_range = (beat_times >= CHART_START_TIME) & (beat_times < music_length - CHART_END_MARGIN)
+    beat_times = beat_times[in_range]
+    strengths = strengths[in_range]
+
+    count = len(beat_times)
+    index = np.arange(count)
+    full = index % 16 == 0
+    diagonal = (index % 8 == 0) & ~full
+    pair = (index % 4 == 0) & ~(index % 8 == 0)
+    other = index % 4 != 0
+
+    # 乱数（ノーツを置くビートを選ぶための値と、レーンを選ぶための値）は難易度によらず1度だけ引く
+    noise = rng.random(count)
+
+    # その他のビートに、オンセット強度の強い順（乱数で揺らす）に 0〜1 の順位を付ける
+    peak = strengths.max() if count else 0.0
+    normalized = strengths / peak if peak > 0 else np.zeros(count)
+    score = ONSET_WEIGHT * (1.0 - normalized) + (1.0 - ONSET_WEIGHT) * noise
+    other_index = np.flatnonzero(other)
+    rank = np.empty(count)
+    rank[other_index[np.argsort(score[other_index], kind="stable")]] = np.arange(len(other_index))
+    rank /= max(len(other_index), 1)
+
+    # 4ビートごとの区切りのビートで最後に置かれるレーン（その後のランダムなノーツの基準になる）
+    group = index // 4
+    group_start = np.arange(0, count, 4)
+    anchor = np.where(group_start % 16 == 0, lane_count - 1,
+                      np.where(group_start % 8 == 0, (group_start // 8) % lane_count,
+                               (group_start // 4) % 2 * 2 + 1))
+
+    # 全ての難易度で共通の、区切りのビートのノーツ
+    structure_beats = [np.repeat(index[full], lane_count), index[diagonal],
+                       np.repeat(index[pair], 2)]
+    structure_lanes = [np.tile(np.arange(lane_count), int(full.sum())), (index[diagonal] // 8) % lane_count,
+                       ((index[pair] // 4) % 2 * 2)[:, np.newaxis] + np.array([[0, 1]])]
+    structure_beats = np.concatenate(structure_beats)
+    structure_lanes = np.concatenate([lanes.ravel() for lanes in structure_lanes])
+
+    # 全ての難易度のランダムなノーツをまとめて計算する（行が難易度）
+    rates = np.array(list(difficulties.values()), dtype=np.float64)[:, np.newaxis]
+    placed = other & (rank < rates)
+    if lane_count >= 4:
+        # 区切りごとに、区切りのレーン以外のレーンをランダムに並べ、区切りの後の3ビートに順に割り当てる
+        keys = rng.random((len(group_start), lane_count))
+        keys[np.arange(len(group_start)), anchor] = np.inf
+        group_lanes = np.argsort(keys, axis=1)[:, :3]
+        random_lanes = np.broadcast_to(group_lanes[group, np.maximum(index % 4 - 1, 0)], placed.shape)
+    else:
+        # レーンが少ない場合は、直前のノーツのレーンから同じ区切りの中で置いたノーツの分だけずらす
+        # （直前と同じレーンにはならないが、難易度によってレーンが変わることがある）
+        offsets = rng.integers(1, max(lane_count, 2), size=count)
+        steps = np.where(placed, offsets, 0)
+        cumulative = np.cumsum(steps, axis=1)
+        random_lanes = (anchor[group] + cumulative - cumulative[:, group * 4]) % lane_count
+
+    charts = {}
+    for row, name in enumerate(difficulties):
+        note_beats = np.concatenate([structure_beats, index[placed[row]]])
+        note_lanes = np.concatenate([structure_lanes, random_lanes[row][placed[row]]])
+        order = np.lexsort((note_lanes, note_beats))
+        charts[name] = (note_lanes[order].astype(np.int8), beat_times[note_beats[order]])
+    return charts
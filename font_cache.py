@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+フォントファイルのパスのキャッシュ
+pygame.font.SysFont は起動のたびにシステムのフォント一覧を調べる（Linux では fc-list を実行する）ため、
+フォント名から見つかったファイルのパスを保存しておき、次回からは pygame.font.Font で直接読み込む
+"""
+
+import os
+import json
+
+import pygame
+
+FONT_CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "fonts.json")
+
+# 日本語フォントの候補（Windows, macOS, Linux の順）
+JAPANESE_FONT_NAMES = ["Yu Gothic", "Hiragino Sans", "Noto Sans CJK JP", "IPAGothic", "TakaoGothic"]
+
+
+def _load_cache(cache_file):
+    try:
+        with open(cache_file, "r") as f:
+            cache = json.load(f)
+        return cache if isinstance(cache, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(cache_file, cache):
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        temp_path = cache_file + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(cache, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, cache_file)
+    except OSError as e:
+        print(f"フォントのキャッシュ保存に失敗しました: {e}")
+
+
+def resolve_font_path(names, cache_file=FONT_CACHE_FILE):
+    """候補のフォント名から最初に見つかったフォントファイルのパスを返す（見つからなければ None）
+
+    結果はキャッシュし、保存したファイルが存在する間はシステムのフォント一覧を調べない。
+    どの候補も見つからなかったことも記録するので、フォントを追加した場合はキャッシュファイルを削除する
+    """
+    key = "|".join(names)
+    cache = _load_cache(cache_file)
+    if key in cache:
+        path = cache[key]
+        if path is None or os.path.exists(path):
+            return path
+
+    path = None
+    for name in names:
+        path = pygame.font.match_font(name)
+        if path:
+            break
+    cache[key] = path
+    _save_cache(cache_file, cache)
+    return path
+
+
+def load_fonts(names, sizes, cache_file=FONT_CACHE_FILE):
+    """候補のフォント名から見つかったフォントを各サイズで読み込む（見つからなければデフォルトフォント）"""
+    path = resolve_font_path(names, cache_file)
+    try:
+        return [pygame.font.Font(path, size) for size in sizes]
+    except (OSError, pygame.error) as e:
+        print(f"フォントの読み込みに失敗しました: {e}")
+        return [pygame.font.Font(None, size) for size in sizes]
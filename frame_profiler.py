@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+フレーム時間のプロファイラ
+メインループの処理を区間（イベント処理・見逃し判定・描画・画面反映・フレーム待ち）に分けて計測し、
+直近のフレームを固定長のリングバッファに保持する。オーバーレイ表示と CSV/JSON への書き出しに対応する
+
+計測は区間の境目で time.perf_counter() を1回呼ぶだけなので、オーバーレイを表示していなければ
+1フレームあたり数マイクロ秒程度で済む
+"""
+
+import csv
+import json
+import time
+
+import numpy as np
+import pygame
+
+# 計測する区間
+PHASE_EVENTS = 0      # イベントの取り出しと処理（判定を含む）
+PHASE_MISS_CHECK = 1  # 楽曲時計の補正・見逃し判定・判定音の再生
+PHASE_DRAW = 2        # 画面描画
+PHASE_OVERLAY = 3     # プロファイラのオーバーレイ描画
+PHASE_FLIP = 4        # 画面への反映（display.flip / display.update）
+PHASE_WAIT = 5        # 次のフレームまでの待ち
+PHASE_NAMES = ["events", "miss_check", "draw", "overlay", "flip", "wait"]
+PHASE_COLORS = [(80, 160, 255), (255, 120, 80), (80, 220, 120), (160, 160, 160), (220, 200, 60), (120, 120, 120)]
+
+FRAME_PROFILE_SIZE = 1800       # 保持するフレーム数（60FPSで30秒分）
+DROPPED_FRAME_FACTOR = 1.5      # フレーム時間がこの倍数を超えたらフレーム落ちとみなす
+
+# オーバーレイの設定
+OVERLAY_GRAPH_FRAMES = 240      # グラフに表示するフレーム数
+OVERLAY_GRAPH_HEIGHT = 80       # グラフの高さ（フレーム時間2つ分）
+OVERLAY_REFRESH_FRAMES = 15     # オーバーレイを描き直す間隔（フレーム数）
+OVERLAY_BACKGROUND = (0, 0, 0, 180)
+
+
+class FrameProfiler:
+    """メインループの区間ごとの処理時間を記録するクラス"""
+    def __init__(self, frame_time, size=FRAME_PROFILE_SIZE):
+        self.frame_time = frame_time
+        self.size = size
+        self.samples = np.zeros((size, len(PHASE_NAMES)), dtype=np.float64)  # 区間ごとの時間（秒）
+        self.starts = np.zeros(size, dtype=np.float64)  # 計測開始からのフレーム開始時刻（秒）
+        self.font = None
+        self.overlay = None
+        self.overlay_age = 0
+        self.start()
+
+    def start(self):
+        """計測を開始する（これまでの記録は破棄する）"""
+        self.cursor = 0
+        self.frame_count = 0      # 計測開始からのフレーム数
+        self.dropped_frames = 0   # 計測開始からのフレーム落ちの数
+        self.current = [0.0] * len(PHASE_NAMES)
+        self.session_start = time.perf_counter()
+        self.frame_start = self.session_start
+        self.mark = self.session_start
+
+    def lap(self, phase):
+        """前回の区切りからの時間を phase の区間に加算する"""
+        now = time.perf_counter()
+        self.current[phase] += now - self.mark
+        self.mark = now
+
+    def end_frame(self):
+        """1フレーム分の計測結果をリングバッファに記録する"""
+        self.samples[self.cursor] = self.current
+        self.starts[self.cursor] = self.frame_start - self.session_start
+        if self.mark - self.frame_start > self.frame_time * DROPPED_FRAME_FACTOR:
+            self.dropped_frames += 1
+        self.cursor = (self.cursor + 1) % self.size
+        self.frame_count += 1
+        self.current = [0.0] * len(PHASE_NAMES)
+        self.frame_start = self.mark
+
+    def frames(self):
+        """記録されているフレームを古い順に (開始時刻配列, 区間ごとの時間配列) で返す"""
+        if self.frame_count < self.size:
+            return self.starts[:self.cursor], self.samples[:self.cursor]
+        order = np.roll(np.arange(self.size), -self.cursor)
+        return self.starts[order], self.samples[order]
+
+    def percentiles(self):
+        """区間ごと（と合計・待ちを除いた処理時間）の p50/p95/p99（ミリ秒）を返す"""
+        _, samples = self.frames()
+        if len(samples) == 0:
+            return {}
+        columns = dict(zip(PHASE_NAMES, samples.T))
+        columns["total"] = samples.sum(axis=1)
+        columns["work"] = columns["total"] - samples[:, PHASE_WAIT]
+        return {name: dict(zip(("p50", "p95", "p99"), (np.percentile(values, [50, 95, 99]) * 1000).tolist()))
+                for name, values in columns.items()}
+
+    def draw_overlay(self, surface):
+        """フレーム時間のグラフと統計をオーバーレイ表示し、描画した領域を返す"""
+        if self.overlay is None or self.overlay_age >= OVERLAY_REFRESH_FRAMES:
+            self.overlay = self._render_overlay()
+            self.overlay_age = 0
+        self.overlay_age += 1
+        return surface.blit(self.overlay, (surface.get_width() - self.overlay.get_width() - 10, 10))
+
+    def _render_overlay(self):
+        """オーバーレイの Surface を作成する"""
+        if self.font is None:
+            self.font = pygame.font.Font(None, 18)
+        line_height = self.font.get_linesize()
+        stats = self.percentiles()
+        lines = [f"{name:<10} p50 {values['p50']:6.2f}  p95 {values['p95']:6.2f}  p99 {values['p99']:6.2f} ms"
+                 for name, values in stats.items()]
+        lines.append(f"dropped {self.dropped_frames} / {self.frame_count} frames")
+
+        width = OVERLAY_GRAPH_FRAMES + 20
+        height = OVERLAY_GRAPH_HEIGHT + 20 + line_height * len(lines)
+        overlay = pygame.Surface((width, height), pygame.SRCALPHA)
+        overlay.fill(OVERLAY_BACKGROUND)
+
+        # 区間ごとの時間を積み上げたグラフ（待ち時間は除く）
+        _, samples = self.frames()
+        samples = samples[-OVERLAY_GRAPH_FRAMES:]
+        scale = OVERLAY_GRAPH_HEIGHT / (self.frame_time * 2)
+        bottom = 10 + OVERLAY_GRAPH_HEIGHT
+        tops = bottom - np.minimum(np.cumsum(samples * scale, axis=1), OVERLAY_GRAPH_HEIGHT)
+        for x, (frame_tops, frame_samples) in enumerate(zip(tops.tolist(), samples.tolist())):
+            y = bottom
+            for phase, top in enumerate(frame_tops):
+                if phase != PHASE_WAIT and frame_samples[phase] > 0:
+                    pygame.draw.line(overlay, PHASE_COLORS[phase], (10 + x, y), (10 + x, top))
+                y = top
+        budget_y = bottom - self.frame_time * scale
+        pygame.draw.line(overlay, (255, 255, 255), (10, budget_y), (10 + OVERLAY_GRAPH_FRAMES, budget_y))
+
+        for i, line in enumerate(lines):
+            color = PHASE_COLORS[i] if i < len(PHASE_NAMES) else (255, 255, 255)
+            overlay.blit(self.font.render(line, True, color), (10, bottom + 5 + i * line_height))
+        return overlay
+
+    def export(self, path):
+        """記録したフレームを書き出す（拡張子が .json なら JSON、それ以外は CSV）"""
+        starts, samples = self.frames()
+        totals = samples.sum(axis=1)
+        if path.endswith(".json"):
+            report = {
+                "frame_time_ms": self.frame_time * 1000,
+                "frame_count": self.frame_count,
+                "dropped_frames": self.dropped_frames,
+                "percentiles_ms": self.percentiles(),
+                "phases": PHASE_NAMES,
+                "frames": [{"start": start, "total_ms": total * 1000,
+                            **{f"{name}_ms": value * 1000 for name, value in zip(PHASE_NAMES, row)}}
+                           for start, total, row in zip(starts.tolist(), totals.tolist(), samples.tolist())],
+            }
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2)
+        else:
+            with open(path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["start"] + [f"{name}_ms" for name in PHASE_NAMES] + ["total_ms"])
+                for start, total, row in zip(starts.tolist(), totals.tolist(), samples.tolist()):
+                    writer.writerow([f"{start:.6f}"] + [f"{value * 1000:.4f}" for value in row]
+                                    + [f"{total * 1000:.4f}"])
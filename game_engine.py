@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ゲームロジック（判定・スコア・コンボ・ランク）
+描画・音声・実時間に依存しないため、画面なしで仮想時計を使って実時間より速くプレイを再現できる
+
+使い方（オートプレイで譜面を最後までプレイする）:
+    python game_engine.py beatmap.json
+    python game_engine.py --synthetic 10000
+"""
+
+import time
+import argparse
+
+import numpy as np
+
+from note_chart import NoteChart
+
+# 判定設定
+PERFECT_RANGE = 0.03  # ±0.03秒
+GREAT_RANGE = 0.05    # ±0.05秒
+GOOD_RANGE = 0.10     # ±0.10秒
+BAD_RANGE = 0.15      # ±0.15秒
+
+# 点数設定
+PERFECT_SCORE = 100
+GREAT_SCORE = 80
+GOOD_SCORE = 50
+BAD_SCORE = 20
+MISS_SCORE = 0
+
+# 判定ごとの点数とコンボが続くかどうか
+JUDGMENT_RULES = [
+    ("PERFECT", PERFECT_RANGE, PERFECT_SCORE, True),
+    ("GREAT", GREAT_RANGE, GREAT_SCORE, True),
+    ("GOOD", GOOD_RANGE, GOOD_SCORE, True),
+    ("BAD", BAD_RANGE, BAD_SCORE, False),
+]
+JUDGMENT_SCORES = {name: score for name, _, score, _ in JUDGMENT_RULES}
+JUDGMENT_SCORES["MISS"] = MISS_SCORE
+
+# ランク設定（精度の下限, ランク）
+RANK_THRESHOLDS = [(0.95, "S"), (0.90, "A"), (0.80, "B"), (0.70, "C"), (0.60, "D")]
+
+
+class JudgeEngine:
+    """判定・スコア・コンボを管理するクラス"""
+    def __init__(self, notes):
+        self.notes = notes
+        self.notes.reset()
+        self.score = 0
+        self.combo = 0
+        self.max_combo = 0
+        self.judgments = {"PERFECT": 0, "GREAT": 0, "GOOD": 0, "BAD": 0, "MISS": 0}
+        self.swept_until = float("-inf")  # 見逃し判定を済ませた楽曲時間
+
+    def judge(self, lane, song_time):
+        """キー入力を判定し、判定名を返す（対象のノーツがなければ None）
+
+        先に song_time 時点で見逃しているノーツを MISS にしておくことで、
+        フレームの区切り方に関係なく同じ入力列から同じ結果になる
+        """
+        self.sweep_misses(song_time)
+
+        # BAD判定の範囲内で最も近い未判定ノーツを探す
+        closest_index = self.notes.find_closest(lane, song_time, BAD_RANGE)
+        if closest_index < 0:
+            return None
+        closest_time_diff = abs(self.notes.time[closest_index] - song_time)
+
+        # 判定（範囲の狭い順に当てはめ、どれにも入らなければ BAD）
+        judgment, _, score, keeps_combo = JUDGMENT_RULES[-1]
+        for rule in JUDGMENT_RULES:
+            if closest_time_diff <= rule[1]:
+                judgment, _, score, keeps_combo = rule
+                break
+
+        self.notes.judge(closest_index, judgment)
+        self.score += score
+        self.judgments[judgment] += 1
+        if keeps_combo:
+            self.combo += 1
+        else:
+            self.combo = 0
+
+        # 最大コンボ更新
+        if self.combo > self.max_combo:
+            self.max_combo = self.combo
+        return judgment
+
+    def sweep_misses(self, song_time):
+        """見逃したノーツを MISS にして、その数を返す"""
+        if song_time > self.swept_until:
+            self.swept_until = song_time
+        missed_count = self.notes.sweep_misses(song_time - BAD_RANGE)
+        if missed_count > 0:
+            self.judgments["MISS"] += missed_count
+            self.combo = 0
+        return missed_count
+
+    def accuracy(self):
+        """精度（0.0〜1.0）を計算"""
+        total_notes = sum(self.judgments.values())
+        if total_notes == 0:
+            return 0.0
+        total_score = sum(JUDGMENT_SCORES[name] * count for name, count in self.judgments.items())
+        return total_score / (total_notes * PERFECT_SCORE)
+
+    def rank(self):
+        """プレイの評価ランクを計算"""
+        if sum(self.judgments.values()) == 0:
+            return "E"
+        accuracy = self.accuracy()
+        for threshold, rank in RANK_THRESHOLDS:
+            if accuracy >= threshold:
+                return rank
+        return "E"
+
+    def result(self):
+        """プレイ結果をまとめて返す"""
+        return {
+            "score": self.score,
+            "max_combo": self.max_combo,
+            "judgments": dict(self.judgments),
+            "accuracy": self.accuracy(),
+            "rank": self.rank(),
+        }
+
+
+class VirtualClock:
+    """実時間に依存しない仮想時計"""
+    def __init__(self, start_time=0.0):
+        self.time = start_time
+
+    def advance_to(self, song_time):
+        """指定した時刻まで進める（戻ることはない）"""
+        if song_time > self.time:
+            self.time = song_time
+
+    def now(self):
+        return self.time
+
+
+def autoplay_inputs(notes, offset=0.0, jitter=0.0, seed=0):
+    """譜面どおりにキーを押す入力列 [(楽曲時間, レーン), ...] を作る
+
+    offset でタイミングを一律にずらし、jitter で正規分布のばらつきを加える
+    """
+    times = notes.time + offset
+    if jitter > 0:
+        times = times + np.random.default_rng(seed).normal(0.0, jitter, len(times))
+    order = np.argsort(times, kind="stable")
+    return list(zip(times[order].tolist(), notes.lane[order].tolist()))
+
+
+class HeadlessGame:
+    """画面・音声なしで、仮想時計を使ってプレイを進めるクラス"""
+    def __init__(self, notes, inputs):
+        self.engine = JudgeEngine(notes)
+        self.clock = VirtualClock()
+        self.inputs = sorted(inputs)
+
+    def run(self, end_time=None):
+        """全ての入力を処理し、曲の終わりまで見逃し判定を行って結果を返す"""
+        for song_time, lane in self.inputs:
+            self.clock.advance_to(song_time)
+            self.engine.judge(lane, song_time)
+
+        if end_time is None:
+            last_note_time = float(self.engine.notes.time[-1]) if len(self.engine.notes) else 0.0
+            end_time = last_note_time + BAD_RANGE + 1.0
+        self.clock.advance_to(end_time)
+        self.engine.sweep_misses(self.clock.now())
+        return self.engine.result()
+
+
+def synthetic_chart(note_count, lane_count=4, notes_per_second=8.0, seed=0):
+    """ベンチマークや回帰テスト用に、一定の密度でランダムな譜面を作る"""
+    rng = np.random.default_rng(seed)
+    intervals = rng.exponential(1.0 / notes_per_second, note_count)
+    times = 2.0 + np.cumsum(intervals)
+    lanes = rng.integers(0, lane_count, note_count)
+    return NoteChart(lanes, times, lane_count)
+
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description="オートプレイで譜面を画面なしでプレイします")
+    parser.add_argument("beatmap", nargs="?", help="譜面ファイル（.json または .bin）")
+    parser.add_argument("--synthetic", type=int, metavar="N", help="N 個のノーツのランダム譜面を使う")
+    parser.add_argument("--offset", type=float, default=0.0, help="入力タイミングのずれ（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="入力タイミングのばらつき（標準偏差, 秒）")
+    parser.add_argument("--seed", type=int, default=0, help="乱数のシード")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        notes = synthetic_chart(args.synthetic, seed=args.seed)
+    elif args.beatmap:
+        from beatmap_format import load_chart
+        notes = load_chart(args.beatmap, lane_count=4)
+    else:
+        parser.error("譜面ファイルか --synthetic を指定してください")
+
+    start = time.perf_counter()
+    game = HeadlessGame(notes, autoplay_inputs(notes, args.offset, args.jitter, args.seed))
+    result = game.run()
+    elapsed = time.perf_counter() - start
+
+    print(f"ノーツ数: {len(notes)}, 処理時間: {elapsed * 1000:.1f} ms")
+    print(f"スコア: {result['score']}, 最大コンボ: {result['max_combo']}, "
+          f"精度: {result['accuracy'] * 100:.2f}%, ランク: {result['rank']}")
+    print(f"判定: {result['judgments']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+譜面データ（ノーツ列）
+ノーツ1つごとにオブジェクトを作らず、レーン・時間・状態・判定を NumPy 配列で保持する。
+テンポとスクロール速度のタイムラインから、ノーツごとの移動量（画面上の位置の元になる値）も前もって計算しておく
+"""
+
+import bisect
+import hashlib
+
+import numpy as np
+
+from timing_timeline import TimingTimeline
+
+# ノーツの状態
+NOTE_PENDING = 0  # 未判定
+NOTE_JUDGED = 1   # 判定済み（MISSを含む）
+
+# 判定コード（judgment 配列に格納する値）
+JUDGMENT_NONE = -1
+JUDGMENT_NAMES = ["PERFECT", "GREAT", "GOOD", "BAD", "MISS"]
+JUDGMENT_CODES = {name: code for code, name in enumerate(JUDGMENT_NAMES)}
+
+
+class NoteChart:
+    """ノーツ列を時間順の配列として保持するクラス"""
+    def __init__(self, lanes, times, lane_count, timeline=None):
+        lanes = np.asarray(lanes, dtype=np.int8)
+        times = np.asarray(times, dtype=np.float64)
+
+        # 時間順に並べ替える（安定ソートなので同時刻ノーツの順序は保たれる）
+        order = np.argsort(times, kind="stable")
+        self.lane = lanes[order]
+        self.time = times[order]
+        self.state = np.full(len(self.time), NOTE_PENDING, dtype=np.uint8)
+        self.judgment = np.full(len(self.time), JUDGMENT_NONE, dtype=np.int8)
+
+        # レーンごとの索引（時間順のノーツ番号とその時間）
+        self.lane_count = lane_count
+        self.lane_indices = [np.flatnonzero(self.lane == lane) for lane in range(lane_count)]
+        self.lane_times = [self.time[indices] for indices in self.lane_indices]
+        self.lane_cursors = [0] * lane_count  # レーンごとの未判定ノーツの先頭位置
+
+        # テンポとスクロール速度（指定がなければ一定の速さで流れる）
+        self.set_timeline(timeline if timeline is not None else TimingTimeline())
+
+    def __len__(self):
+        return len(self.time)
+
+    def content_hash(self):
+        """譜面の内容（レーン数・時間・レーン）の SHA-1 ハッシュを返す"""
+        digest = hashlib.sha1()
+        digest.update(self.lane_count.to_bytes(2, "little"))
+        digest.update(self.time.astype("<f8").tobytes())
+        digest.update(self.lane.astype("i1").tobytes())
+        return digest.digest()
+
+    def set_timeline(self, timeline):
+        """タイムラインを設定し、ノーツごとの移動量を計算し直す"""
+        self.timeline = timeline
+        self.position = timeline.positions_at(self.time)  # スクロール速度が負にならないので時間順に並ぶ
+
+    def reset(self):
+        """判定状態を初期化する"""
+        self.state.fill(NOTE_PENDING)
+        self.judgment.fill(JUDGMENT_NONE)
+        self.lane_cursors = [0] * self.lane_count
+
+    def _advance_cursor(self, lane):
+        """判定済みノーツを読み飛ばしてレーンの先頭位置を進める"""
+        indices = self.lane_indices[lane]
+        cursor = self.lane_cursors[lane]
+        while cursor < len(indices) and self.state[indices[cursor]] != NOTE_PENDING:
+            cursor += 1
+        self.lane_cursors[lane] = cursor
+        return cursor
+
+    def find_closest(self, lane, elapsed_time, window):
+        """レーン内で elapsed_time ± window に入る最も近い未判定ノーツの番号を返す。なければ -1"""
+        cursor = self._advance_cursor(lane)
+        times = self.lane_times[lane]
+        indices = self.lane_indices[lane]
+        # 配列を直接二分探索する（範囲内のノーツは数個なので、その先は1つずつ調べる）
+        start = bisect.bisect_left(times, elapsed_time - window, cursor)
+        end = bisect.bisect_right(times, elapsed_time + window, start)
+
+        closest_index = -1
+        closest_time_diff = float("inf")
+        for position in range(start, end):
+            index = int(indices[position])
+            if self.state[index] == NOTE_PENDING:
+                time_diff = abs(float(times[position]) - elapsed_time)
+                if time_diff < closest_time_diff:
+                    closest_index = index
+                    closest_time_diff = time_diff
+        return closest_index
+
+    def judge(self, index, judgment):
+        """ノーツに判定を記録する"""
+        self.state[index] = NOTE_JUDGED
+        self.judgment[index] = JUDGMENT_CODES[judgment]
+
+    def sweep_misses(self, miss_threshold):
+        """miss_threshold より前の未判定ノーツを MISS にして、その数を返す"""
+        missed_count = 0
+        miss_code = JUDGMENT_CODES["MISS"]
+        for lane in range(self.lane_count):
+            cursor = self.lane_cursors[lane]
+            times = self.lane_times[lane]
+            # ほとんどのフレームでは先頭のノーツもまだ見逃していないので、二分探索せずに済ませる
+            if cursor >= len(times) or times[cursor] >= miss_threshold:
+                continue
+            end = bisect.bisect_left(times, miss_threshold, cursor)
+            candidates = self.lane_indices[lane][cursor:end]
+            missed = candidates[self.state[candidates] == NOTE_PENDING]
+            self.state[missed] = NOTE_JUDGED
+            self.judgment[missed] = miss_code
+            missed_count += len(missed)
+            self.lane_cursors[lane] = end
+        return missed_count
+
+    def visible_notes(self, elapsed_time, distance_before, distance_after, judgment_line_y, note_speed):
+        """画面内の未判定ノーツについて (レーン配列, Y座標配列) を返す
+
+        distance_before/distance_after は判定ラインから画面の上端・下端までの移動量（基準の速さで流れる秒数）
+        """
+        # 現在時刻の移動量（変化点の二分探索と線形補間を1回ずつ）
+        current = self.timeline.position_at(elapsed_time)
+        start = int(np.searchsorted(self.position, current - distance_after, side="left"))
+        end = int(np.searchsorted(self.position, current + distance_before, side="right"))
+        pending = self.state[start:end] == NOTE_PENDING
+        lanes = self.lane[start:end][pending]
+        # 判定ラインまでの残りの移動量からY座標をまとめて計算
+        ys = judgment_line_y - (self.position[start:end][pending] - current) * note_speed
+        return lanes, ys
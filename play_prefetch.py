@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+次のプレイの先読み
+リザルト画面を表示している間に、再プレイや次の曲で使う譜面の生成と音楽ファイルの読み込みを
+バックグラウンドのスレッドで済ませておき、プレイ開始時にまとめて引き継ぐ。
+音楽ファイルは圧縮されたままメモリに読み込み、pygame.mixer.music にはメモリから渡す
+（曲全体を PCM にデコードすると長い曲では数百 MB になり、ミキサーの再生位置を基準にした楽曲時計も使えないため）
+"""
+
+import io
+import os
+import threading
+
+
+class PreparedPlay:
+    """先読みした1回分のプレイのデータ"""
+    def __init__(self, music_path, notes, music_length, music_data):
+        self.music_path = music_path
+        self.notes = notes
+        self.music_length = music_length
+        self.music_data = music_data  # 音楽ファイルの中身（bytes）
+
+    def music_file(self):
+        """pygame.mixer.music.load に渡すファイルオブジェクト"""
+        return io.BytesIO(self.music_data)
+
+    def music_namehint(self):
+        """ファイル形式を判別するための拡張子"""
+        return os.path.splitext(self.music_path)[1].lstrip(".")
+
+
+class PlayPrefetcher:
+    """次のプレイを先読みするクラス
+
+    build_chart(music_path) は (譜面, 音楽の長さ) を返す関数で、ワーカースレッドから呼ばれる
+    """
+    def __init__(self, build_chart):
+        self.build_chart = build_chart
+        self.lock = threading.Lock()
+        self.queue = []       # 準備する音楽ファイルのパス（先頭から順に準備する）
+        self.building = None  # ワーカーが準備している音楽ファイルのパス
+        self.wanted = set()   # 結果を残す音楽ファイルのパス（予約から外れた曲の結果は捨てる）
+        self.prepared = {}    # 音楽ファイルのパス → PreparedPlay
+        self.waiters = {}     # 音楽ファイルのパス → 準備ができたときに呼ぶ関数（claim で登録）
+        self.thread = None
+
+    def schedule(self, music_paths):
+        """前回の予約を取り消して、music_paths を順に先読みする（準備済みのもの・準備中のものはそのまま使う）"""
+        music_paths = [path for path in dict.fromkeys(music_paths) if path]
+        with self.lock:
+            self.wanted = set(music_paths)
+            self.waiters = {}
+            self.prepared = {path: self.prepared[path] for path in music_paths if path in self.prepared}
+            self.queue = [path for path in music_paths if path not in self.prepared and path != self.building]
+            if self.queue and self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+
+    def cancel(self):
+        """予約と準備済みのデータを全て捨てる（準備中の曲の結果も使わない）"""
+        with self.lock:
+            self.wanted = set()
+            self.waiters = {}
+            self.queue = []
+            self.prepared = {}
+
+    def claim(self, music_path, on_ready):
+        """music_path のプレイを on_ready(prepared) で受け取り、他の曲の予約と準備済みのデータは捨てる
+
+        準備済みならその場で呼ぶ。準備中・予約中なら準備ができたときにワーカースレッドから呼ぶ
+        （準備に失敗したら None を渡す）。music_path が予約されていなければ何もせず False を返す
+        """
+        with self.lock:
+            prepared = self.prepared.pop(music_path, None)
+            pending = prepared is None and (music_path == self.building or music_path in self.queue)
+            self.prepared = {}
+            self.queue = [music_path] if pending and music_path in self.queue else []
+            self.wanted = set()
+            self.waiters = {music_path: on_ready} if pending else {}
+        if prepared is not None:
+            on_ready(prepared)
+        return prepared is not None or pending
+
+    def is_ready(self, music_path):
+        with self.lock:
+            return music_path in self.prepared
+
+    def _run(self):
+        """予約された曲を順に準備する（ワーカースレッドで実行）"""
+        while True:
+            with self.lock:
+                if not self.queue:
+                    self.thread = None
+                    return
+                music_path = self.building = self.queue.pop(0)
+
+            prepared = None
+            try:
+                notes, music_length = self.build_chart(music_path)
+                with open(music_path, "rb") as f:
+                    music_data = f.read()
+                prepared = PreparedPlay(music_path, notes, music_length, music_data)
+            except Exception as e:
+                print(f"次のプレイの先読みに失敗しました: {e}")
+
+            # 受け取りを待っていればすぐに渡し、予約から外れていなければ残す
+            with self.lock:
+                self.building = None
+                on_ready = self.waiters.pop(music_path, None)
+                if on_ready is None and prepared is not None and music_path in self.wanted:
+                    self.prepared[music_path] = prepared
+            if on_ready is not None:
+                on_ready(prepared)
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+リプレイの記録と再生
+プレイ中のキー入力（楽曲時間とレーン）を、譜面のハッシュ・判定幅・プレイ結果と一緒に
+バイナリファイルに保存する。ビート検出やランダム生成で作った譜面はファイルに残らないため、
+譜面（ノーツの時間とレーン）もリプレイに含める。再生は画面・音声なしで判定ロジックだけを実行するため、
+実時間よりはるかに速く、記録時と同じ判定数・最大コンボ・スコアを再現できる
+
+使い方:
+    python replay.py replays/replay_20250101_120000_000.rpl               # リプレイに含まれる譜面で再生し、結果を照合
+    python replay.py replays/replay_20250101_120000_000.rpl beatmap.json  # 譜面ファイルに対して再生し、結果を照合
+
+ファイル構成（リトルエンディアン）:
+    ヘッダ    マジック "RGRP", バージョン, レーン数, 音楽ファイル名の長さ, 譜面のハッシュ(SHA-1),
+              判定幅(PERFECT, GREAT, GOOD, BAD), 終了時の楽曲時間, スコア, 最大コンボ,
+              判定数(PERFECT, GREAT, GOOD, BAD, MISS), 入力数, ノーツ数
+    音楽ファイル名（UTF-8）
+    譜面      ノーツの時間(float64) をノーツ数分、続けてレーン(uint8) をノーツ数分
+    レコード  楽曲時間(float64), 入力前に見逃し判定を済ませていた楽曲時間(float64), レーン(uint8) を入力数分
+
+見逃し判定はフレームごとに行われるため、入力時点でどこまで見逃し判定が済んでいたかも記録し、
+再生時に同じ順序で処理することで結果を完全に一致させる。
+バージョン 1 のファイル（ノーツ数と譜面がない）も読み込めるが、再生には譜面ファイルが必要
+"""
+
+import os
+import sys
+import time
+import struct
+import argparse
+
+import numpy as np
+
+import game_engine
+from beatmap_format import load_chart, BeatmapFormatError
+from game_engine import JudgeEngine
+from note_chart import NoteChart, JUDGMENT_NAMES
+
+REPLAY_MAGIC = b"RGRP"
+REPLAY_VERSION = 2
+HEADER_V1 = struct.Struct("<4sHHH20s4ddII5II")
+HEADER = struct.Struct("<4sHHH20s4ddII5III")
+RECORD_DTYPE = np.dtype([("time", "<f8"), ("swept_until", "<f8"), ("lane", "u1")])
+NOTE_SIZE = 8 + 1  # 譜面のノーツ1つあたりのバイト数（時間 float64 + レーン uint8）
+
+# リプレイの保存先
+REPLAY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "replays")
+
+
+class ReplayFormatError(Exception):
+    """リプレイファイルの形式が不正な場合のエラー"""
+
+
+def judgment_windows():
+    """現在の判定幅 (PERFECT, GREAT, GOOD, BAD) を返す"""
+    return (game_engine.PERFECT_RANGE, game_engine.GREAT_RANGE,
+            game_engine.GOOD_RANGE, game_engine.BAD_RANGE)
+
+
+class ReplayRecorder:
+    """プレイ中のキー入力を記録するクラス"""
+    def __init__(self):
+        self.times = []
+        self.swept_until = []
+        self.lanes = []
+
+    def record(self, song_time, lane, swept_until):
+        """キー入力を記録する（swept_until は入力前に見逃し判定を済ませていた楽曲時間）"""
+        self.times.append(song_time)
+        self.swept_until.append(swept_until)
+        self.lanes.append(lane)
+
+    def __len__(self):
+        return len(self.times)
+
+    def save(self, path, notes, engine, music_file=""):
+        """記録した入力をプレイ結果と一緒に保存する"""
+        records = np.empty(len(self.times), dtype=RECORD_DTYPE)
+        records["time"] = self.times
+        records["swept_until"] = self.swept_until
+        records["lane"] = self.lanes
+
+        music_file_bytes = music_file.encode("utf-8")
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, notes.lane_count, len(music_file_bytes),
+                                notes.content_hash(), *judgment_windows(), engine.swept_until,
+                                engine.score, engine.max_combo,
+                                *[engine.judgments[name] for name in JUDGMENT_NAMES], len(records),
+                                len(notes)))
+            f.write(music_file_bytes)
+            f.write(notes.time.astype("<f8").tobytes())
+            f.write(notes.lane.astype("u1").tobytes())
+            f.write(records.tobytes())
+
+
+def new_replay_path():
+    """日時（ミリ秒まで）から新しいリプレイファイルのパスを作る（同じ名前のファイルがあれば連番を付ける）"""
+    now = time.time()
+    stem = time.strftime("replay_%Y%m%d_%H%M%S", time.localtime(now)) + f"_{int(now * 1000) % 1000:03d}"
+    path = os.path.join(REPLAY_DIR, stem + ".rpl")
+    counter = 1
+    while os.path.exists(path):
+        path = os.path.join(REPLAY_DIR, f"{stem}_{counter}.rpl")
+        counter += 1
+    return path
+
+
+def load_replay(path):
+    """リプレイファイルを読み込む（バージョン 1 のファイルは "chart" が None になる）"""
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < HEADER_V1.size:
+        raise ReplayFormatError(f"ヘッダが不完全です: {path}")
+
+    magic, version = struct.unpack_from("<4sH", data)
+    if magic != REPLAY_MAGIC:
+        raise ReplayFormatError(f"リプレイファイルではありません: {path}")
+    if version == 1:
+        header, note_count = HEADER_V1, None
+        (magic, version, lane_count, music_file_length, chart_hash, perfect_range, great_range,
+         good_range, bad_range, end_time, score, max_combo, *counts, event_count) = header.unpack_from(data)
+    elif version == REPLAY_VERSION:
+        header = HEADER
+        if len(data) < header.size:
+            raise ReplayFormatError(f"ヘッダが不完全です: {path}")
+        (magic, version, lane_count, music_file_length, chart_hash, perfect_range, great_range,
+         good_range, bad_range, end_time, score, max_combo, *counts, event_count,
+         note_count) = header.unpack_from(data)
+    else:
+        raise ReplayFormatError(f"対応していないバージョンです: {version}")
+
+    chart_offset = header.size + music_file_length
+    records_offset = chart_offset + (note_count or 0) * NOTE_SIZE
+    if records_offset + event_count * RECORD_DTYPE.itemsize > len(data):
+        raise ReplayFormatError(f"レコードが不完全です: {path}")
+
+    chart = None
+    if note_count is not None:
+        chart = {
+            "times": np.frombuffer(data, dtype="<f8", count=note_count, offset=chart_offset),
+            "lanes": np.frombuffer(data, dtype="u1", count=note_count, offset=chart_offset + note_count * 8),
+        }
+
+    return {
+        "lane_count": lane_count,
+        "music_file": data[header.size:chart_offset].decode("utf-8"),
+        "chart_hash": chart_hash,
+        "chart": chart,
+        "windows": (perfect_range, great_range, good_range, bad_range),
+        "end_time": end_time,
+        "result": {
+            "score": score,
+            "max_combo": max_combo,
+            "judgments": dict(zip(JUDGMENT_NAMES, counts)),
+        },
+        "records": np.frombuffer(data, dtype=RECORD_DTYPE, count=event_count, offset=records_offset),
+    }
+
+
+def replay_chart(replay):
+    """リプレイに含まれる譜面（含まれていなければ None）"""
+    chart = replay["chart"]
+    if chart is None:
+        return None
+    return NoteChart(chart["lanes"], chart["times"], replay["lane_count"])
+
+
+def run_replay(notes, replay):
+    """リプレイの入力を記録された順に判定し、プレイ結果を返す"""
+    engine = JudgeEngine(notes)
+    records = replay["records"]
+    for song_time, swept_until, lane in zip(records["time"].tolist(), records["swept_until"].tolist(),
+                                            records["lane"].tolist()):
+        engine.sweep_misses(swept_until)
+        engine.judge(lane, song_time)
+    engine.sweep_misses(replay["end_time"])
+    return engine.result()
+
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description="リプレイの内容を表示し、譜面に対して再生して結果を照合します")
+    parser.add_argument("replay", help="リプレイファイル（.rpl）")
+    parser.add_argument("beatmap", nargs="?",
+                        help="譜面ファイル（.json または .bin、省略時はリプレイに含まれる譜面を使う）")
+    args = parser.parse_args()
+
+    try:
+        replay = load_replay(args.replay)
+    except (OSError, ReplayFormatError) as e:
+        print(f"リプレイの読み込みに失敗しました: {e}")
+        sys.exit(1)
+
+    recorded = replay["result"]
+    print(f"音楽ファイル: {replay['music_file']}, 入力数: {len(replay['records'])}, "
+          f"譜面のハッシュ: {replay['chart_hash'].hex()}")
+    print(f"記録: スコア {recorded['score']}, 最大コンボ {recorded['max_combo']}, 判定 {recorded['judgments']}")
+    if args.beatmap:
+        try:
+            notes = load_chart(args.beatmap, replay["lane_count"])
+        except (OSError, ValueError, KeyError, BeatmapFormatError) as e:
+            print(f"譜面の読み込みに失敗しました: {e}")
+            sys.exit(1)
+    else:
+        notes = replay_chart(replay)
+        if notes is None:
+            print("このリプレイには譜面が含まれていません（バージョン 1）。譜面ファイルを指定してください")
+            sys.exit(1)
+    if notes.content_hash() != replay["chart_hash"]:
+        print("譜面のハッシュがリプレイと一致しません")
+        sys.exit(1)
+    if replay["windows"] != judgment_windows():
+        print(f"注意: 判定幅が記録時と異なります（記録時 {replay['windows']}, 現在 {judgment_windows()}）")
+
+    start = time.perf_counter()
+    result = run_replay(notes, replay)
+    elapsed = time.perf_counter() - start
+
+    print(f"再生: スコア {result['score']}, 最大コンボ {result['max_combo']}, 判定 {result['judgments']} "
+          f"({elapsed * 1000:.1f} ms)")
+    matched = all(result[key] == recorded[key] for key in ("score", "max_combo", "judgments"))
+    print("記録と一致しました" if matched else "記録と一致しません")
+    if not matched:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
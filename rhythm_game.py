@@ -6,17 +6,39 @@
 仕様書: rhythm_game_specification.md に基づいて実装
 """
 
+import time
+
+# 起動時間の計測開始。pygame・NumPy などの重いモジュールの読み込み時間も含めるため、他の import より前に記録する
+STARTUP_TIME = time.perf_counter()
+
 import os
 import sys
-import time
+import threading
+from collections import deque
 import pygame
 import random
 from pygame.locals import *
+from beat_cache import BeatCache
+from audio_probe import get_duration
+from note_chart import NoteChart
+from timing_timeline import TimingTimeline
+from game_engine import JudgeEngine
+from text_cache import TextCache
+from sound_bank import SoundBank, pre_init_mixer
+from font_cache import load_fonts, JAPANESE_FONT_NAMES
+from startup_timer import StartupTimer
+from song_library import SongLibrary
+from play_prefetch import PlayPrefetcher
+from replay import ReplayRecorder, new_replay_path
+from song_clock import SongClock, Calibration, load_audio_offset, save_audio_offset
+from frame_profiler import (FrameProfiler, PHASE_EVENTS, PHASE_MISS_CHECK, PHASE_DRAW,
+                            PHASE_OVERLAY, PHASE_FLIP, PHASE_WAIT)
 
 # 定数定義
 SCREEN_WIDTH = 800
 SCREEN_HEIGHT = 600
 FPS = 60
+FRAME_TIME = 1.0 / FPS
 WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
 GRAY = (100, 100, 100)
@@ -46,19 +68,6 @@ LANE_WIDTH = SCREEN_WIDTH // LANE_COUNT
 LANE_COLORS = [BLUE, GREEN, YELLOW, RED]
 LANE_KEYS = ['D', 'F', 'J', 'K']
 
-# 判定設定
-PERFECT_RANGE = 0.03  # ±0.03秒
-GREAT_RANGE = 0.05    # ±0.05秒
-GOOD_RANGE = 0.10     # ±0.10秒
-BAD_RANGE = 0.15      # ±0.15秒
-
-# 点数設定
-PERFECT_SCORE = 100
-GREAT_SCORE = 80
-GOOD_SCORE = 50
-BAD_SCORE = 20
-MISS_SCORE = 0
-
 # 判定色設定
 PERFECT_COLOR = CYAN
 GREAT_COLOR = GREEN
@@ -69,64 +78,88 @@ MISS_COLOR = RED
 # ノーツの落下速度（ピクセル/秒）
 NOTE_SPEED = 400
 
-class Note:
-    """ノーツクラス"""
-    def __init__(self, lane, time):
-        self.lane = lane  # レーン番号（0-3）
-        self.time = time  # 叩くタイミング（秒）
-        self.y = 0        # 現在のY座標
-        self.hit = False  # 叩かれたかどうか
-        self.judgment = None  # 判定結果
-        self.width = LANE_WIDTH - 20  # ノーツの幅
-        self.height = 20             # ノーツの高さ
-
-    def update(self, current_time, music_start_time):
-        """ノーツの位置を更新"""
-        # 音楽開始からの経過時間
-        elapsed_time = current_time - music_start_time
-        # 叩くタイミングまでの残り時間
-        time_to_hit = self.time - elapsed_time
-        # 残り時間に基づいてY座標を計算
-        self.y = JUDGMENT_LINE_Y - (time_to_hit * NOTE_SPEED)
-
-    def draw(self, screen):
-        """ノーツを描画"""
-        if not self.hit:
-            x = self.lane * LANE_WIDTH + 10  # レーンの中央に配置
-            pygame.draw.rect(screen, LANE_COLORS[self.lane],
-                            (x, self.y, self.width, self.height))
-            pygame.draw.rect(screen, WHITE,
-                            (x, self.y, self.width, self.height), 2)
+# ビート検出から譜面を作るときの難易度（chart_generator.DIFFICULTIES のいずれか）
+CHART_DIFFICULTY = "normal"
+
+# デフォルトの音楽ファイル（sample_music/ 内、曲選択画面で変更できる）
+DEFAULT_MUSIC_FILE = "jpop_rhythm_game.mp3"
+
+# 曲選択画面に一度に表示する曲の数
+SONG_SELECT_ROWS = 11
+
+# 音楽の長さが取得できない場合のデフォルト値（3分）
+DEFAULT_MUSIC_LENGTH = 180.0
+
+# 描画設定
+DIRTY_RECT_MODE = False  # True にするとプレイ中は変化した領域だけを画面に反映する
+
+# 入力設定
+INPUT_POLL_INTERVAL = 0.001  # フレーム待ちの間に入力を確認する間隔（秒）
+INPUT_LOG_SIZE = 1024        # 記録しておく入力タイムスタンプの数
+
+# フレーム時間のプロファイラ
+PROFILER_KEY = K_F3                # オーバーレイの表示を切り替えるキー
+# 終了時に計測結果を書き出すファイル（例: "frame_profile.csv", "frame_profile.json"）。
+# 起動時の --profile-export PATH か環境変数 RHYTHM_GAME_PROFILE_EXPORT でも指定できる
+FRAME_PROFILE_EXPORT_FILE = os.environ.get("RHYTHM_GAME_PROFILE_EXPORT") or None
+
+# ノーツの大きさ（ピクセル）
+NOTE_WIDTH = LANE_WIDTH - 20
+NOTE_HEIGHT = 20
+
+# ノーツの種類（スプライトの種類）
+NOTE_TYPE_TAP = "tap"
+NOTE_TYPES = [NOTE_TYPE_TAP]
+
+# 画面内に表示されるノーツの範囲（判定ラインからの移動量、スクロール速度 1.0 で流れる秒数）
+VISIBLE_DISTANCE_BEFORE = (JUDGMENT_LINE_Y + NOTE_HEIGHT) / NOTE_SPEED  # 画面上端に現れるまで
+VISIBLE_DISTANCE_AFTER = (SCREEN_HEIGHT - JUDGMENT_LINE_Y) / NOTE_SPEED  # 画面下端に消えるまで
 
 class RhythmGame:
     """リズムゲームのメインクラス"""
-    def __init__(self):
-        # PyGameの初期化
-        pygame.init()
+    def __init__(self, profile_export_file=None, song_library=None, beat_cache=None):
+        # 起動時間の計測（モジュールの読み込みから最初のフレームの表示まで）
+        self.startup_timer = StartupTimer(STARTUP_TIME)
+        self.startup_timer.mark("import")
+
+        # PyGameの初期化（使うモジュールだけを初期化する）
+        pygame.display.init()
+        pygame.font.init()
+        pre_init_mixer()  # 効果音の遅延を減らすため、ミキサーのバッファを小さくする
         pygame.mixer.init()
         pygame.display.set_caption("リズムゲーム")
+        self.startup_timer.mark("pygame.init")
 
         # 画面設定
         self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-        self.clock = pygame.time.Clock()
+        self.startup_timer.mark("display")
+        self.frame_deadline = time.perf_counter()
+
+        # 入力（到着時刻付きで蓄えて、フレーム処理時に取り出す）
+        self.pending_events = []
+        self.input_log = deque(maxlen=INPUT_LOG_SIZE)  # (到着時刻, 処理時刻, レーン, 楽曲時間)
+
+        # フレーム時間のプロファイラ（計測は常に行い、オーバーレイは PROFILER_KEY で表示する）
+        self.profiler = FrameProfiler(FRAME_TIME)
+        self.profile_export_file = profile_export_file or FRAME_PROFILE_EXPORT_FILE
+        self.show_profiler = False
 
         # フォント設定 - 日本語対応
-        try:
-            # 日本語フォントを探す (Windows)
-            self.font_large = pygame.font.SysFont("Yu Gothic", 60)
-            self.font_medium = pygame.font.SysFont("Yu Gothic", 36)
-            self.font_small = pygame.font.SysFont("Yu Gothic", 24)
-        except:
-            try:
-                # 日本語フォントを探す (macOS)
-                self.font_large = pygame.font.SysFont("Hiragino Sans", 60)
-                self.font_medium = pygame.font.SysFont("Hiragino Sans", 36)
-                self.font_small = pygame.font.SysFont("Hiragino Sans", 24)
-            except:
-                # フォールバック: デフォルトフォント
-                self.font_large = pygame.font.SysFont(None, 60)
-                self.font_medium = pygame.font.SysFont(None, 36)
-                self.font_small = pygame.font.SysFont(None, 24)
+        # 見つかったフォントファイルのパスはキャッシュし、次回からはシステムのフォント一覧を調べない
+        # （見つからなければデフォルトフォント）
+        self.font_large, self.font_medium, self.font_small = load_fonts(JAPANESE_FONT_NAMES, [60, 36, 24])
+        self.startup_timer.mark("fonts")
+
+        # 文字列描画のキャッシュ
+        self.text_cache = TextCache()
+
+        # プレイフィールドのレイヤーと差分描画の状態
+        self.playfield_layer = None
+        self.note_sprites = None   # (レーン, ノーツの種類) → 描画済みのノーツ
+        self.dirty_rect_mode = DIRTY_RECT_MODE
+        self.dirty_rects = []      # 前フレームで描画した領域
+        self.update_rects = None   # 今フレームで画面に反映する領域（None なら全体）
+        self.full_redraw = True
 
         # 背景画像の読み込み
         self.background_path = os.path.join(os.path.dirname(__file__), "background.gif")
@@ -140,12 +173,17 @@ class RhythmGame:
 
         # ゲーム状態
         self.running = True
-        self.game_state = "title"  # title, playing, result
-
-        # 音楽ファイルのパス
-        music_filename = "jpop_rhythm_game.mp3"
+        self.game_state = "title"  # title, select, loading, playing, result, calibration
+
+        # 曲のライブラリ（選択中の曲がなければデフォルトの曲を使う）
+        self.song_library = song_library or SongLibrary()
+        self.song_list = []
+        self.song_cursor = 0
+        self.library_scan_thread = None
+        self.library_scanned = threading.Event()  # バックグラウンドでのライブラリの更新が終わった
+        music_filename = self.song_library.selected() or DEFAULT_MUSIC_FILE
         self.music_path = os.path.join(os.path.dirname(__file__), "sample_music", music_filename)
-        
+
         # 音楽ファイルが存在するか確認
         if not os.path.exists(self.music_path):
             print(f"警告: 音楽ファイル {self.music_path} が見つかりません。")
@@ -157,375 +195,321 @@ class RhythmGame:
                     self.music_path = os.path.join(sample_music_dir, mp3_files[0])
                     print(f"代替の音楽ファイル {self.music_path} を使用します。")
 
-        # 効果音ディレクトリの確認と作成
-        sounds_dir = os.path.join(os.path.dirname(__file__), "sounds")
-        os.makedirs(sounds_dir, exist_ok=True)
-
-        # 効果音ファイルの生成（存在しない場合）
-        self._generate_sound_effects(sounds_dir)
-
-        # 効果音の読み込み
-        try:
-            self.sound_perfect = pygame.mixer.Sound(os.path.join(sounds_dir, "perfect.wav"))
-            self.sound_great = pygame.mixer.Sound(os.path.join(sounds_dir, "great.wav"))
-            self.sound_good = pygame.mixer.Sound(os.path.join(sounds_dir, "good.wav"))
-            self.sound_bad = pygame.mixer.Sound(os.path.join(sounds_dir, "bad.wav"))
-            self.sound_miss = pygame.mixer.Sound(os.path.join(sounds_dir, "miss.wav"))
-        except pygame.error as e:
-            print(f"効果音の読み込みに失敗しました: {e}")
-            # ダミーの効果音オブジェクトを作成
-            class DummySound:
-                def play(self): pass
-            self.sound_perfect = DummySound()
-            self.sound_great = DummySound()
-            self.sound_good = DummySound()
-            self.sound_bad = DummySound()
-            self.sound_miss = DummySound()
+        # 効果音（準備が終わるまではダミー、同じフレームで鳴らした同じ種類の音はまとめて1回だけ鳴らす）
+        self.sound_bank = SoundBank()
 
         # ゲームデータ
-        self.notes = []
-        self.score = 0
-        self.combo = 0
-        self.max_combo = 0
-        self.judgments = {"PERFECT": 0, "GREAT": 0, "GOOD": 0, "BAD": 0, "MISS": 0}
+        self.notes = NoteChart([], [], LANE_COUNT)
+        self.engine = JudgeEngine(self.notes)  # 判定・スコア・コンボ
+        self.replay_recorder = ReplayRecorder()
         self.judgment_display = None
         self.judgment_time = 0
 
         # 音楽関連
-        self.music_start_time = 0
+        self.song_clock = SongClock(load_audio_offset())  # ミキサーの再生位置に同期した楽曲時計
         self.music_length = 0
+        self.calibration = None
+
+        # ビート解析結果のキャッシュ
+        self.beat_cache = beat_cache or BeatCache()
+
+        # 読み込み状態
+        self.chart_ready = threading.Event()
+        self.loading_thread = None
+        self.loading_lock = threading.Lock()
+        self.loading_token = 0
+        self.loading_progress = 0.0
+        self.loading_message = ""
+
+        # 次のプレイの先読み（リザルト画面の間に譜面と音楽ファイルを準備しておく）
+        self.prefetcher = PlayPrefetcher(self.generate_notes)
+        self.prepared_music = None  # メモリに読み込んだ音楽ファイル（PreparedPlay）
+
+        # 効果音とノーツをバックグラウンドで準備する
+        self._start_loading()
+        self.startup_timer.mark("init")
+
+    def _start_loading(self):
+        """効果音の準備とノーツ生成をバックグラウンドで開始する"""
+        self.chart_ready.clear()
+        self.loading_progress = 0.0
+        self.loading_message = "読み込み中..."
+        # 曲を選び直した場合に古い読み込みの結果を使わないよう、読み込みごとに番号を付ける
+        with self.loading_lock:
+            self.loading_token += 1
+            token = self.loading_token
+        self.loading_thread = threading.Thread(target=self._load_assets, args=(token, self.music_path),
+                                               daemon=True)
+        self.loading_thread.start()
+
+    def _load_assets(self, token, music_path):
+        """効果音とノーツを準備する（ワーカースレッドで実行）"""
+        notes = None
+        music_length = DEFAULT_MUSIC_LENGTH
+        try:
+            if not self.sound_bank.loaded:
+                self.loading_message = "効果音を準備しています..."
+                self.sound_bank.load()
+            self.loading_progress = 0.2
 
-        # ノーツ生成
-        self.generate_notes()
+            self.loading_message = "曲の一覧を更新しています..."
+            self.song_library.scan()
+            self.loading_progress = 0.3
 
-    def _generate_sound_effects(self, sounds_dir):
-        """効果音ファイルを生成する（存在しない場合）"""
-        def generate_sound(filename, freq, duration):
+            self.loading_message = "譜面を生成しています..."
+            notes, music_length = self.generate_notes(music_path)
+        except Exception as e:
+            print(f"読み込み中にエラーが発生しました: {e}")
+        finally:
+            # 最新の読み込みの結果だけを反映する
+            with self.loading_lock:
+                if token == self.loading_token:
+                    if notes is not None:
+                        self.notes = notes
+                        self.music_length = music_length
+                    self.loading_progress = 1.0
+                    self.loading_message = "読み込み完了"
+                    self.chart_ready.set()
+
+    def generate_notes(self, music_path):
+        """曲のノーツを生成し、(譜面, 音楽の長さ) を返す"""
+        music_length = self._music_length(music_path)
+
+        # 曲ごとの譜面（batch_generate.py で生成したもの）があれば読み込む
+        from beatmap_format import load_chart
+        chart_path = self.song_library.chart_path(self.song_library.song(os.path.basename(music_path)))
+        if chart_path and os.path.exists(chart_path):
             try:
-                import math
-                import numpy as np
-                import wave
-                import struct
-
-                sample_rate = 44100
-                t = np.linspace(0, duration, int(sample_rate * duration), False)
-                wave_data = np.sin(2 * np.pi * freq * t) * 32767
-                wave_data = np.int16(wave_data)
-
-                # WAVファイルとして保存
-                with wave.open(os.path.join(sounds_dir, filename), 'w') as wf:
-                    wf.setnchannels(1)  # モノラル
-                    wf.setsampwidth(2)  # 16ビット
-                    wf.setframerate(sample_rate)
-                    wf.writeframes(wave_data.tobytes())
-                return True
+                notes = load_chart(chart_path, LANE_COUNT)
+                print(f"曲の譜面ファイルから {len(notes)} 個のノーツを読み込みました: {chart_path}")
+                return notes, music_length
             except Exception as e:
-                print(f"効果音の生成に失敗しました: {e}")
-                return False
-
-        # 効果音が存在しない場合は生成
-        if not os.path.exists(os.path.join(sounds_dir, "perfect.wav")):
-            generate_sound("perfect.wav", 880, 0.1)
-        if not os.path.exists(os.path.join(sounds_dir, "great.wav")):
-            generate_sound("great.wav", 660, 0.1)
-        if not os.path.exists(os.path.join(sounds_dir, "good.wav")):
-            generate_sound("good.wav", 440, 0.1)
-        if not os.path.exists(os.path.join(sounds_dir, "bad.wav")):
-            generate_sound("bad.wav", 220, 0.1)
-        if not os.path.exists(os.path.join(sounds_dir, "miss.wav")):
-            generate_sound("miss.wav", 110, 0.1)
-
-    def generate_notes(self):
-        """ノーツを生成する"""
-        # 譜面ファイルからノーツを読み込む
+                print(f"曲の譜面ファイルの読み込みに失敗しました: {e}")
+
+        # 譜面ファイルからノーツを読み込む（譜面に別の曲が指定されていれば使わない）
         beatmap_file = os.path.join(os.path.dirname(__file__), "beatmap.json")
+        binary_beatmap_file = os.path.join(os.path.dirname(__file__), "beatmap.bin")
+
+        # バイナリ譜面が JSON 譜面より新しければ、そちらを読み込む
+        if os.path.exists(binary_beatmap_file) and (
+                not os.path.exists(beatmap_file) or
+                os.path.getmtime(binary_beatmap_file) >= os.path.getmtime(beatmap_file)):
+            try:
+                notes = load_chart(binary_beatmap_file, LANE_COUNT, music_path)
+                if notes is not None:
+                    print(f"バイナリ譜面ファイルから {len(notes)} 個のノーツを読み込みました")
+                    return notes, music_length
+            except Exception as e:
+                print(f"バイナリ譜面ファイルの読み込みに失敗しました: {e}")
 
         # 譜面ファイルが存在する場合は、そこからノーツを読み込む
         if os.path.exists(beatmap_file):
-            import json
             try:
-                with open(beatmap_file, 'r') as f:
-                    beatmap_data = json.load(f)
-
-                # 譜面データからノーツを生成
-                self.notes = []
-                for note_data in beatmap_data['notes']:
-                    lane = note_data['lane']  # レーン (0-3)
-                    time = note_data['time']  # 秒単位のタイミング
-                    self.notes.append(Note(lane, time))
-
-                # 音楽ファイルのパスを設定（譜面に指定があれば）
-                if 'music_file' in beatmap_data:
-                    music_path = os.path.join(os.path.dirname(__file__),
-                                            "sample_music",
-                                            beatmap_data['music_file'])
-                    if os.path.exists(music_path):
-                        self.music_path = music_path
-
-                # 音楽の長さを取得
-                try:
-                    pygame.mixer.music.load(self.music_path)
-                    temp_sound = pygame.mixer.Sound(self.music_path)
-                    self.music_length = temp_sound.get_length()
-                except pygame.error as e:
-                    print(f"音楽ファイルの読み込みに失敗しました: {e}")
-                    print("デフォルト値を使用します。")
-                    self.music_length = 180.0  # デフォルト3分
-
-                print(f"譜面ファイルから {len(self.notes)} 個のノーツを読み込みました")
-                return
+                notes = load_chart(beatmap_file, LANE_COUNT, music_path)
+                if notes is not None:
+                    print(f"譜面ファイルから {len(notes)} 個のノーツを読み込みました")
+                    return notes, music_length
             except Exception as e:
                 print(f"譜面ファイルの読み込みに失敗しました: {e}")
 
         # 音楽ファイルからビートを検出してノーツを生成
-        if self.generate_notes_from_audio():
-            return
+        notes = self.generate_notes_from_audio(music_path, music_length)
+        if notes is not None:
+            return notes, music_length
 
-        # 上記の方法が失敗した場合は、ランダム生成にフォールバック
+        # 上記の方法が失敗した場合は、ランダム生成にフォールバック（曲ごとのシードを使うので、毎回同じ譜面になる）
         print("ランダムにノーツを生成します")
-        self._generate_random_notes()
-
-    def generate_notes_from_audio(self):
-        """音楽ファイルを解析してビートを検出し、ノーツを生成する"""
+        from chart_generator import chart_seed
+        song = self.song_library.song(os.path.basename(music_path))
+        timeline = TimingTimeline.from_records(None, song["bpm"] if song else None)
+        seed = chart_seed(os.path.basename(music_path))
+        return self._generate_random_notes(music_length, timeline, seed), music_length
+
+    def generate_notes_from_audio(self, music_path, music_length):
+        """音楽ファイルを解析してビートを検出し、ノーツを生成する（失敗したら None）"""
         try:
-            import librosa
-            import numpy as np
-
-            print(f"音楽ファイル {self.music_path} からビートを検出しています...")
-
-            # 音楽ファイルを読み込む
-            y, sr = librosa.load(self.music_path)
-
-            # ビート検出
-            tempo, beat_frames = librosa.beat.beat_track(y=y, sr=sr)
-            beat_times = librosa.frames_to_time(beat_frames, sr=sr)
+            from chart_generator import detect_beats, generate_charts, chart_seed, DIFFICULTIES
 
+            # キャッシュに解析結果があれば librosa を使わない
+            tempo, beat_times, beat_strengths, cached = detect_beats(music_path, self.beat_cache)
+            if cached:
+                print(f"ビート解析結果をキャッシュから読み込みました: {music_path}")
             print(f"テンポ: {tempo} BPM, {len(beat_times)} 個のビートを検出しました")
+            self.song_library.set_bpm(os.path.basename(music_path), tempo)
 
-            # ノーツを生成
-            self.notes = []
-
-            # 最初の数秒は除外（イントロ部分）
-            start_time = 2.0
-            beat_times = [t for t in beat_times if t >= start_time]
-
-            # 音楽の長さを取得
-            try:
-                temp_sound = pygame.mixer.Sound(self.music_path)
-                self.music_length = temp_sound.get_length()
-            except pygame.error:
-                print("音楽の長さを取得できませんでした。デフォルト値を使用します。")
-                self.music_length = 180.0  # デフォルト3分
-
-            # ビートごとにノーツを生成
-            for i, beat_time in enumerate(beat_times):
-                if beat_time >= self.music_length - 1:
-                    break
-
-                # 4ビートごとに全レーンにノーツを配置
-                if i % 16 == 0:
-                    for lane in range(LANE_COUNT):
-                        self.notes.append(Note(lane, beat_time))
-                # 8ビートごとに対角線パターン
-                elif i % 8 == 0:
-                    lane = (i // 8) % LANE_COUNT
-                    self.notes.append(Note(lane, beat_time))
-                # 4ビートごとに交互パターン
-                elif i % 4 == 0:
-                    lane = (i // 4) % 2 * 2  # 0か2
-                    self.notes.append(Note(lane, beat_time))
-                    self.notes.append(Note(lane + 1, beat_time))
-                # その他のビートはランダムに1つのレーンを選択
-                else:
-                    # 連続して同じレーンにならないようにする
-                    if self.notes and i > 0:
-                        last_lane = self.notes[-1].lane
-                        available_lanes = [l for l in range(LANE_COUNT) if l != last_lane]
-                        lane = random.choice(available_lanes)
-                    else:
-                        lane = random.randint(0, LANE_COUNT - 1)
-
-                    # 一部のビートはスキップ（難易度調整）
-                    if random.random() < 0.7:  # 70%の確率でノーツを配置
-                        self.notes.append(Note(lane, beat_time))
-
-            print(f"音楽のビートから {len(self.notes)} 個のノーツを生成しました")
-            return True
+            # ビートごとにノーツを生成（曲ごとのシードを使うので、毎回同じ譜面になる）
+            charts = generate_charts(beat_times, beat_strengths, music_length, LANE_COUNT,
+                                     {CHART_DIFFICULTY: DIFFICULTIES[CHART_DIFFICULTY]},
+                                     chart_seed(os.path.basename(music_path)))
+            lanes, times = charts[CHART_DIFFICULTY]
+            notes = NoteChart(lanes, times, LANE_COUNT, TimingTimeline.from_records(None, tempo))
+            print(f"音楽のビートから {len(notes)} 個のノーツを生成しました")
+            return notes
 
         except ImportError:
             print("librosaライブラリがインストールされていません。")
             print("pip install librosa でインストールしてください。")
-            return False
+            return None
         except Exception as e:
             print(f"ビート検出中にエラーが発生しました: {e}")
-            return False
-
-            print(f"音楽のビートから {len(self.notes)} 個のノーツを生成しました")
-            return True
-
-        except ImportError:
-            print("librosaライブラリがインストールされていません。")
-            print("pip install librosa でインストールしてください。")
-            return False
-        except Exception as e:
-            print(f"ビート検出中にエラーが発生しました: {e}")
-            return False
-
-    def _generate_random_notes(self):
-        """ランダムにノーツを生成する（フォールバック用）"""
-        # 音楽ファイルの長さを取得
-        try:
-            pygame.mixer.music.load(self.music_path)
-            
-            # 音楽の長さを取得する代替方法
-            # 一時的に Sound オブジェクトを作成して長さを取得
-            try:
-                temp_sound = pygame.mixer.Sound(self.music_path)
-                self.music_length = temp_sound.get_length()
-            except pygame.error:
-                print("音楽の長さを取得できませんでした。デフォルト値を使用します。")
-                self.music_length = 180.0  # デフォルト3分
-        except pygame.error:
-            print("音楽ファイルの読み込みに失敗しました。デフォルト値を使用します。")
-            self.music_length = 180.0  # デフォルト3分
-
-        # BPMを120と仮定して、4分音符の間隔を計算
-        bpm = 120
-        beat_interval = 60 / bpm
-
+            return None
+
+    def _music_length(self, music_path):
+        """音楽の長さを取得する（ヘッダのみを読み、結果はファイルごとにキャッシュされる）"""
+        music_length = get_duration(music_path)
+        if music_length is None:
+            print("音楽の長さを取得できませんでした。デフォルト値を使用します。")
+            music_length = DEFAULT_MUSIC_LENGTH
+        return music_length
+
+    def _generate_random_notes(self, music_length, timeline, seed=0):
+        """タイムラインのテンポに合わせてランダムにノーツを生成する（フォールバック用、同じ seed なら同じ譜面）"""
+        rng = random.Random(seed)
         # 音楽の長さに応じてノーツを生成
+        lanes = []
+        times = []
         current_time = 2.0  # 最初のノーツは2秒後から
-        while current_time < self.music_length - 1:
+        while current_time < music_length - 1:
             # 各レーンにランダムにノーツを配置
-            lane = random.randint(0, LANE_COUNT - 1)
-            self.notes.append(Note(lane, current_time))
+            lane = rng.randint(0, LANE_COUNT - 1)
+            lanes.append(lane)
+            times.append(current_time)
 
-            # 次のノーツまでの間隔（1拍または半拍）
-            if random.random() < 0.7:
+            # 次のノーツまでの間隔（その時点のテンポで1拍または半拍）
+            beat_interval = timeline.beat_length_at(current_time)
+            if rng.random() < 0.7:
                 current_time += beat_interval
             else:
                 current_time += beat_interval / 2
 
-        print(f"ランダムに {len(self.notes)} 個のノーツを生成しました")
+        notes = NoteChart(lanes, times, LANE_COUNT, timeline)
+        print(f"ランダムに {len(notes)} 個のノーツを生成しました")
+        return notes
 
     def reset_game(self):
-        """ゲームをリセットする"""
-        self.notes = []
-        self.score = 0
-        self.combo = 0
-        self.max_combo = 0
-        self.judgments = {"PERFECT": 0, "GREAT": 0, "GOOD": 0, "BAD": 0, "MISS": 0}
+        """ゲームをリセットする（次のプレイの先読みが済んでいるか準備中なら、読み込み直さずにそれを使う）"""
         self.judgment_display = None
         self.judgment_time = 0
-        self.generate_notes()
+        self.notes = NoteChart([], [], LANE_COUNT)
+        self.engine = JudgeEngine(self.notes)
+        self.prepared_music = None
+        self.chart_ready.clear()
+        self.loading_progress = 0.0
+        self.loading_message = "譜面を準備しています..."
+        with self.loading_lock:
+            self.loading_token += 1
+            token = self.loading_token
+        if self.prefetcher.claim(self.music_path, lambda prepared: self._use_prepared_play(token, prepared)):
+            return
+        self._start_loading()
+
+    def _use_prepared_play(self, token, prepared):
+        """先読みした譜面と音楽ファイルに切り替える（先読みに失敗していたら読み込み直す）"""
+        with self.loading_lock:
+            if token != self.loading_token:
+                return  # その後に別の曲を選んだ
+            if prepared is not None:
+                self.notes = prepared.notes
+                self.music_length = prepared.music_length
+                self.prepared_music = prepared
+                self.loading_progress = 1.0
+                self.loading_message = "読み込み完了"
+                self.chart_ready.set()
+                return
+        self._start_loading()
+
+    def next_song_path(self):
+        """ライブラリで今の曲の次にある曲のパス（他に曲がなければ None）"""
+        songs = self.song_library.songs()
+        names = [song["name"] for song in songs]
+        current = os.path.basename(self.music_path)
+        if len(songs) < 2 or current not in names:
+            return None
+        return self.song_library.music_path(songs[(names.index(current) + 1) % len(songs)])
+
+    def play_next_song(self):
+        """ライブラリの次の曲を選んでプレイを始める"""
+        music_path = self.next_song_path()
+        if music_path is None:
+            return
+        self.song_library.select(os.path.basename(music_path))
+        self.music_path = music_path
+        self.reset_game()
+        self.start_game()
 
     def start_game(self):
         """ゲームを開始する"""
+        # 譜面の準備が終わっていなければ読み込み画面で待つ
+        if not self.chart_ready.is_set():
+            self.game_state = "loading"
+            return
+
         self.game_state = "playing"
+        self.full_redraw = True
+        self.engine = JudgeEngine(self.notes)
+        self.replay_recorder = ReplayRecorder()
+        self.judgment_display = None
         try:
             print(f"音楽ファイルを読み込みます: {self.music_path}")
             print(f"音楽ファイルの存在確認: {os.path.exists(self.music_path)}")
             
-            pygame.mixer.music.load(self.music_path)
+            # 先読みした音楽ファイルがあればメモリから読み込む
+            if self.prepared_music is not None and self.prepared_music.music_path == self.music_path:
+                pygame.mixer.music.load(self.prepared_music.music_file(), self.prepared_music.music_namehint())
+            else:
+                pygame.mixer.music.load(self.music_path)
             pygame.mixer.music.play()
-            self.music_start_time = time.time()
-            print(f"音楽の再生を開始しました。開始時間: {self.music_start_time}")
+            self.song_clock.start()
+            print(f"音楽の再生を開始しました。オフセット: {self.song_clock.audio_offset * 1000:+.0f} ms")
         except pygame.error as e:
             print(f"音楽の読み込みに失敗しました: {e}")
             print(f"ファイルパス: {self.music_path}")
             print("ゲームをリザルト画面に移行します")
             self.game_state = "result"
 
-    def judge_note(self, lane, current_time):
-        """ノーツの判定を行う"""
-        # 音楽開始からの経過時間
-        elapsed_time = current_time - self.music_start_time
+    def finish_game(self):
+        """プレイを終了してリザルト画面へ移り、リプレイを保存する"""
+        self.game_state = "result"
+        # 終了したフレームで予約された判定音を鳴らしておく（残すと次のプレイの開始時に鳴ってしまう）
+        self.sound_bank.flush()
+        replay_path = new_replay_path()
+        try:
+            self.replay_recorder.save(replay_path, self.notes, self.engine, os.path.basename(self.music_path))
+            print(f"リプレイを保存しました: {replay_path}")
+        except OSError as e:
+            print(f"リプレイの保存に失敗しました: {e}")
+
+        # リザルト画面の間に、再プレイと次の曲の譜面・音楽ファイルを先読みする
+        self.prefetcher.schedule([self.music_path, self.next_song_path()])
 
-        closest_note = None
-        closest_time_diff = float('inf')
+    def judge_note(self, lane, song_time):
+        """ノーツの判定を行う（song_time は音楽開始からの経過時間）"""
+        # リプレイ用に、入力前にどこまで見逃し判定を済ませていたかと一緒に記録する
+        self.replay_recorder.record(song_time, lane, self.engine.swept_until)
 
-        # 指定されたレーンの中で最も近いノーツを探す
-        for note in self.notes:
-            if note.lane == lane and not note.hit:
-                time_diff = abs(note.time - elapsed_time)
-                if time_diff < closest_time_diff:
-                    closest_note = note
-                    closest_time_diff = time_diff
+        # 判定前に見逃したノーツを処理しておく（効果音のため）
+        self.check_missed_notes(song_time)
 
-        # 最も近いノーツがない、または遠すぎる場合
-        if closest_note is None or closest_time_diff > BAD_RANGE:
+        judgment = self.engine.judge(lane, song_time)
+        if judgment is None:
             return
 
-        # 判定
-        closest_note.hit = True
-        if closest_time_diff <= PERFECT_RANGE:
-            closest_note.judgment = "PERFECT"
-            self.score += PERFECT_SCORE
-            self.judgments["PERFECT"] += 1
-            self.combo += 1
-            self.sound_perfect.play()
-        elif closest_time_diff <= GREAT_RANGE:
-            closest_note.judgment = "GREAT"
-            self.score += GREAT_SCORE
-            self.judgments["GREAT"] += 1
-            self.combo += 1
-            self.sound_great.play()
-        elif closest_time_diff <= GOOD_RANGE:
-            closest_note.judgment = "GOOD"
-            self.score += GOOD_SCORE
-            self.judgments["GOOD"] += 1
-            self.combo += 1
-            self.sound_good.play()
-        elif closest_time_diff <= BAD_RANGE:
-            closest_note.judgment = "BAD"
-            self.score += BAD_SCORE
-            self.judgments["BAD"] += 1
-            self.combo = 0
-            self.sound_bad.play()
-
-        # 最大コンボ更新
-        if self.combo > self.max_combo:
-            self.max_combo = self.combo
+        # 判定に応じた効果音（フレームの最後にまとめて鳴らす）
+        self.sound_bank.trigger(judgment.lower())
 
         # 判定表示
-        self.judgment_display = closest_note.judgment
-        self.judgment_time = current_time
+        self.judgment_display = judgment
+        self.judgment_time = song_time
 
-    def check_missed_notes(self, current_time):
+    def check_missed_notes(self, song_time):
         """見逃したノーツをチェック"""
-        elapsed_time = current_time - self.music_start_time
-
-        for note in self.notes:
-            if not note.hit and note.time < elapsed_time - BAD_RANGE:
-                note.hit = True
-                note.judgment = "MISS"
-                self.judgments["MISS"] += 1
-                self.combo = 0
-                self.sound_miss.play()
+        # 同じフレームで見逃したノーツはまとめて処理する
+        if self.engine.sweep_misses(song_time) > 0:
+            self.sound_bank.trigger("miss")
 
     def calculate_rank(self):
         """プレイの評価ランクを計算"""
-        total_notes = sum(self.judgments.values())
-        if total_notes == 0:
-            return "E"
-
-        accuracy = (self.judgments["PERFECT"] * PERFECT_SCORE +
-                   self.judgments["GREAT"] * GREAT_SCORE +
-                   self.judgments["GOOD"] * GOOD_SCORE +
-                   self.judgments["BAD"] * BAD_SCORE) / (total_notes * PERFECT_SCORE)
-
-        if accuracy >= 0.95:
-            return "S"
-        elif accuracy >= 0.90:
-            return "A"
-        elif accuracy >= 0.80:
-            return "B"
-        elif accuracy >= 0.70:
-            return "C"
-        elif accuracy >= 0.60:
-            return "D"
-        else:
-            return "E"
+        return self.engine.rank()
 
     def draw_title_screen(self):
         """タイトル画面を描画"""
@@ -536,62 +520,265 @@ class RhythmGame:
             self.screen.fill(BLACK)
 
         # タイトル
-        title_text = self.font_large.render("リズムゲーム", True, WHITE)
+        title_text = self.text_cache.render(self.font_large, "リズムゲーム", WHITE)
         title_rect = title_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//3))
         self.screen.blit(title_text, title_rect)
 
         # 操作説明
-        instruction_text = self.font_medium.render("D, F, J, K キーでプレイ", True, WHITE)
+        instruction_text = self.text_cache.render(self.font_medium, "D, F, J, K キーでプレイ", WHITE)
         instruction_rect = instruction_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2))
         self.screen.blit(instruction_text, instruction_rect)
 
         # スタート案内
-        start_text = self.font_medium.render("スペースキーでスタート", True, WHITE)
+        start_text = self.text_cache.render(self.font_medium, "スペースキーでスタート", WHITE)
         start_rect = start_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT*2//3))
         self.screen.blit(start_text, start_rect)
 
-    def draw_playing_screen(self, current_time):
-        """プレイ画面を描画"""
+        # タイミング調整の案内
+        offset_text = self.text_cache.render(
+            self.font_small, f"Cキーでタイミング調整（現在: {self.song_clock.audio_offset * 1000:+.0f} ms）", WHITE)
+        offset_rect = offset_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT*2//3 + 50))
+        self.screen.blit(offset_text, offset_rect)
+
+        # 曲選択の案内
+        song_text = self.text_cache.render(
+            self.font_small, f"Sキーで曲の選択（現在: {os.path.basename(self.music_path)}）", WHITE)
+        song_rect = song_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT*2//3 + 85))
+        self.screen.blit(song_text, song_rect)
+
+        # 読み込み状況
+        if not self.chart_ready.is_set():
+            loading_text = self.text_cache.render(self.font_small, self.loading_message, GRAY)
+            loading_rect = loading_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT - 50))
+            self.screen.blit(loading_text, loading_rect)
+
+    def open_song_select(self):
+        """曲選択画面を開く（記録済みの曲の一覧をすぐに表示し、ライブラリの更新はバックグラウンドで行う）"""
+        self._set_song_list(os.path.basename(self.music_path))
+        self.game_state = "select"
+        if self.library_scan_thread is None or not self.library_scan_thread.is_alive():
+            self.library_scanned.clear()
+            self.library_scan_thread = threading.Thread(target=self._scan_library, daemon=True)
+            self.library_scan_thread.start()
+
+    def _scan_library(self):
+        """ライブラリを更新する（ワーカースレッドで実行）"""
+        try:
+            self.song_library.scan()
+        except Exception as e:
+            print(f"曲の一覧の更新に失敗しました: {e}")
+        finally:
+            self.library_scanned.set()
+
+    def _set_song_list(self, current):
+        """ライブラリから曲の一覧を読み直し、current の曲にカーソルを合わせる"""
+        self.song_list = self.song_library.songs()
+        names = [song["name"] for song in self.song_list]
+        self.song_cursor = names.index(current) if current in names else 0
+
+    def select_song(self, song):
+        """曲を選んで保存し、その曲の譜面を読み込み直してタイトル画面に戻る"""
+        self.game_state = "title"
+        if os.path.basename(self.music_path) == song["name"]:
+            return
+        self.song_library.select(song["name"])
+        self.music_path = self.song_library.music_path(song)
+        print(f"曲を変更しました: {song['name']}")
+        self.reset_game()
+
+    def draw_song_select_screen(self):
+        """曲選択画面を描画"""
+        # 背景描画
+        if self.background:
+            self.screen.blit(self.background, (0, 0))
+        else:
+            self.screen.fill(BLACK)
+
+        # タイトル
+        title_text = self.text_cache.render(self.font_medium, "曲の選択", WHITE)
+        title_rect = title_text.get_rect(center=(SCREEN_WIDTH//2, 40))
+        self.screen.blit(title_text, title_rect)
+
+        scanning = self.library_scan_thread is not None and self.library_scan_thread.is_alive()
+        if not self.song_list:
+            message = "曲の一覧を更新しています..." if scanning else "sample_music に曲がありません"
+            empty_text = self.text_cache.render(self.font_small, message, GRAY)
+            empty_rect = empty_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2))
+            self.screen.blit(empty_text, empty_rect)
+
+        # カーソルの位置が見えるようにスクロールして曲を表示
+        first = min(max(self.song_cursor - SONG_SELECT_ROWS // 2, 0), max(len(self.song_list) - SONG_SELECT_ROWS, 0))
+        for row, song in enumerate(self.song_list[first:first + SONG_SELECT_ROWS]):
+            index = first + row
+            y_pos = 90 + row * 36
+            color = WHITE if index == self.song_cursor else GRAY
+            if index == self.song_cursor:
+                pygame.draw.rect(self.screen, GRAY, (40, y_pos - 4, SCREEN_WIDTH - 80, 32), 2)
+
+            # 曲名（譜面ファイルがあれば印を付ける）
+            mark = "* " if song["chart"] else "  "
+            name_text = self.text_cache.render(self.font_small, mark + os.path.splitext(song["name"])[0], color)
+            self.screen.blit(name_text, (50, y_pos))
+
+            # 再生時間と BPM
+            duration = f"{int(song['duration']) // 60}:{int(song['duration']) % 60:02d}" if song["duration"] else "--:--"
+            bpm = f"{song['bpm']:.0f} BPM" if song["bpm"] else "--- BPM"
+            info_text = self.text_cache.render(self.font_small, f"{duration}  {bpm}", color)
+            self.screen.blit(info_text, info_text.get_rect(topright=(SCREEN_WIDTH - 50, y_pos)))
+
+        # 操作説明
+        help_text = self.text_cache.render(self.font_small, "↑↓で選択  Enterで決定  Escで戻る  *は譜面あり", WHITE)
+        help_rect = help_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT - 30))
+        self.screen.blit(help_text, help_rect)
+
+    def draw_loading_screen(self):
+        """読み込み画面を描画"""
+        # 背景描画
+        if self.background:
+            self.screen.blit(self.background, (0, 0))
+        else:
+            self.screen.fill(BLACK)
+
+        # 読み込みメッセージ
+        loading_text = self.text_cache.render(self.font_medium, self.loading_message, WHITE)
+        loading_rect = loading_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 40))
+        self.screen.blit(loading_text, loading_rect)
+
+        # プログレスバー
+        bar_width = SCREEN_WIDTH // 2
+        bar_x = (SCREEN_WIDTH - bar_width) // 2
+        bar_y = SCREEN_HEIGHT // 2
+        pygame.draw.rect(self.screen, GRAY, (bar_x, bar_y, bar_width, 20))
+        pygame.draw.rect(self.screen, WHITE, (bar_x, bar_y, int(bar_width * self.loading_progress), 20))
+        pygame.draw.rect(self.screen, WHITE, (bar_x, bar_y, bar_width, 20), 2)
+
+    def start_calibration(self):
+        """タイミング調整（音声オフセットの測定）を開始する"""
+        self.calibration = Calibration(self.sound_bank.effects["perfect"])
+        self.game_state = "calibration"
+
+    def finish_calibration(self):
+        """タイミング調整の結果を保存してタイトル画面に戻る"""
+        audio_offset = self.calibration.result()
+        if audio_offset is None:
+            print("タップ数が足りないため、タイミング調整を中止しました")
+        else:
+            self.song_clock.audio_offset = audio_offset
+            save_audio_offset(audio_offset)
+            print(f"音声オフセットを {audio_offset * 1000:+.0f} ms に設定しました")
+        self.calibration = None
+        self.game_state = "title"
+
+    def draw_calibration_screen(self):
+        """タイミング調整画面を描画"""
         # 背景描画
         if self.background:
             self.screen.blit(self.background, (0, 0))
         else:
             self.screen.fill(BLACK)
 
+        # 説明
+        title_text = self.text_cache.render(self.font_medium, "音に合わせてスペースキーを押してください", WHITE)
+        title_rect = title_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//3))
+        self.screen.blit(title_text, title_rect)
+
+        # 進行状況
+        progress_text = self.text_cache.render(
+            self.font_small, f"タップ: {len(self.calibration.taps)} / クリック: {self.calibration.clicks_played}", WHITE)
+        progress_rect = progress_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2))
+        self.screen.blit(progress_text, progress_rect)
+
+        # 中止案内
+        quit_text = self.text_cache.render(self.font_small, "Escキーで中止", WHITE)
+        quit_rect = quit_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT - 50))
+        self.screen.blit(quit_text, quit_rect)
+
+    def get_playfield_layer(self):
+        """背景・レーン・キー表示・判定ラインを描画済みのレイヤーを返す"""
+        if self.playfield_layer is None:
+            self.playfield_layer = self._build_playfield_layer()
+        return self.playfield_layer
+
+    def invalidate_playfield(self):
+        """画面サイズや見た目が変わったときにプレイフィールドを作り直す"""
+        self.playfield_layer = None
+        self.note_sprites = None
+        self.full_redraw = True
+
+    def get_note_sprites(self):
+        """レーンの色とノーツの種類ごとに描画済みのノーツを返す"""
+        if self.note_sprites is None:
+            self.note_sprites = {}
+            for lane in range(LANE_COUNT):
+                for note_type in NOTE_TYPES:
+                    sprite = pygame.Surface((NOTE_WIDTH, NOTE_HEIGHT)).convert()
+                    sprite.fill(LANE_COLORS[lane])
+                    pygame.draw.rect(sprite, WHITE, (0, 0, NOTE_WIDTH, NOTE_HEIGHT), 2)
+                    self.note_sprites[(lane, note_type)] = sprite
+        return self.note_sprites
+
+    def _build_playfield_layer(self):
+        """プレイフィールドのレイヤーを作成する"""
+        layer = pygame.Surface(self.screen.get_size()).convert()
+
+        # 背景描画
+        if self.background:
+            layer.blit(self.background, (0, 0))
+        else:
+            layer.fill(BLACK)
+
         # レーンを描画
         for i in range(LANE_COUNT):
             x = i * LANE_WIDTH
             # レーン背景
-            pygame.draw.rect(self.screen, GRAY, (x, 0, LANE_WIDTH, SCREEN_HEIGHT))
+            pygame.draw.rect(layer, GRAY, (x, 0, LANE_WIDTH, SCREEN_HEIGHT))
             # レーン境界線
-            pygame.draw.line(self.screen, WHITE, (x, 0), (x, SCREEN_HEIGHT), 2)
+            pygame.draw.line(layer, WHITE, (x, 0), (x, SCREEN_HEIGHT), 2)
 
             # キー表示
-            key_text = self.font_medium.render(LANE_KEYS[i], True, WHITE)
+            key_text = self.text_cache.render(self.font_medium, LANE_KEYS[i], WHITE)
             key_rect = key_text.get_rect(center=(x + LANE_WIDTH//2, SCREEN_HEIGHT - 50))
-            self.screen.blit(key_text, key_rect)
+            layer.blit(key_text, key_rect)
 
         # 判定ライン
-        pygame.draw.line(self.screen, WHITE, (0, JUDGMENT_LINE_Y), (SCREEN_WIDTH, JUDGMENT_LINE_Y), 4)
+        pygame.draw.line(layer, WHITE, (0, JUDGMENT_LINE_Y), (SCREEN_WIDTH, JUDGMENT_LINE_Y), 4)
 
-        # ノーツを描画
-        for note in self.notes:
-            if not note.hit:
-                note.update(current_time, self.music_start_time)
-                note.draw(self.screen)
+        return layer
+
+    def draw_playing_screen(self, song_time):
+        """プレイ画面を描画"""
+        # 静的なプレイフィールドを描画（差分モードでは前フレームで描いた領域だけ戻す）
+        playfield = self.get_playfield_layer()
+        if self.dirty_rect_mode and not self.full_redraw:
+            for rect in self.dirty_rects:
+                self.screen.blit(playfield, rect, rect)
+        else:
+            self.screen.blit(playfield, (0, 0))
+        drawn_rects = []
+
+        # 画面内のノーツだけを描画（Y座標は配列でまとめて計算）
+        lanes, ys = self.notes.visible_notes(song_time,
+                                             VISIBLE_DISTANCE_BEFORE, VISIBLE_DISTANCE_AFTER,
+                                             JUDGMENT_LINE_Y, NOTE_SPEED)
+        # 描画済みのノーツをまとめて転送する
+        note_sprites = self.get_note_sprites()
+        lane_sprites = [note_sprites[(lane, NOTE_TYPE_TAP)] for lane in range(LANE_COUNT)]
+        self.screen.blits([(lane_sprites[lane], (lane * LANE_WIDTH + 10, y))  # レーンの中央に配置
+                           for lane, y in zip(lanes.tolist(), ys.tolist())], doreturn=False)
+        for lane in set(lanes.tolist()):
+            drawn_rects.append(pygame.Rect(lane * LANE_WIDTH, 0, LANE_WIDTH, SCREEN_HEIGHT))
 
         # スコア表示
-        score_text = self.font_medium.render(f"Score: {self.score}", True, WHITE)
-        self.screen.blit(score_text, (10, 10))
+        drawn_rects.append(self.text_cache.blit_number(self.screen, self.font_medium, "Score: ", self.engine.score,
+                                                       WHITE, topleft=(10, 10)))
 
         # コンボ表示
-        if self.combo > 0:
-            combo_text = self.font_medium.render(f"Combo: {self.combo}", True, WHITE)
-            combo_rect = combo_text.get_rect(center=(SCREEN_WIDTH//2, 50))
-            self.screen.blit(combo_text, combo_rect)
+        if self.engine.combo > 0:
+            drawn_rects.append(self.text_cache.blit_number(self.screen, self.font_medium, "Combo: ", self.engine.combo,
+                                                           WHITE, center=(SCREEN_WIDTH//2, 50)))
 
         # 判定表示
-        if self.judgment_display and current_time - self.judgment_time < 0.5:
+        if self.judgment_display and song_time - self.judgment_time < 0.5:
             judgment_color = WHITE
             if self.judgment_display == "PERFECT":
                 judgment_color = PERFECT_COLOR
@@ -604,9 +791,16 @@ class RhythmGame:
             elif self.judgment_display == "MISS":
                 judgment_color = MISS_COLOR
 
-            judgment_text = self.font_medium.render(self.judgment_display, True, judgment_color)
+            judgment_text = self.text_cache.render(self.font_medium, self.judgment_display, judgment_color)
             judgment_rect = judgment_text.get_rect(center=(SCREEN_WIDTH//2, 100))
-            self.screen.blit(judgment_text, judgment_rect)
+            drawn_rects.append(self.screen.blit(judgment_text, judgment_rect))
+
+        # 差分モードでは前フレームと今フレームで描いた領域だけを画面に反映する
+        if self.dirty_rect_mode:
+            if not self.full_redraw:
+                self.update_rects = self.dirty_rects + drawn_rects
+            self.dirty_rects = drawn_rects
+            self.full_redraw = False
 
     def draw_result_screen(self):
         """リザルト画面を描画"""
@@ -622,19 +816,17 @@ class RhythmGame:
         self.screen.blit(overlay, (0, 0))
 
         # タイトル
-        title_text = self.font_large.render("リザルト", True, WHITE)
+        title_text = self.text_cache.render(self.font_large, "リザルト", WHITE)
         title_rect = title_text.get_rect(center=(SCREEN_WIDTH//2, 50))
         self.screen.blit(title_text, title_rect)
 
         # スコア
-        score_text = self.font_medium.render(f"スコア: {self.score}", True, WHITE)
-        score_rect = score_text.get_rect(center=(SCREEN_WIDTH//2, 110))
-        self.screen.blit(score_text, score_rect)
+        self.text_cache.blit_number(self.screen, self.font_medium, "スコア: ", self.engine.score, WHITE,
+                                    center=(SCREEN_WIDTH//2, 110))
 
         # 最大コンボ
-        combo_text = self.font_medium.render(f"最大コンボ: {self.max_combo}", True, WHITE)
-        combo_rect = combo_text.get_rect(center=(SCREEN_WIDTH//2, 150))
-        self.screen.blit(combo_text, combo_rect)
+        self.text_cache.blit_number(self.screen, self.font_medium, "最大コンボ: ", self.engine.max_combo, WHITE,
+                                    center=(SCREEN_WIDTH//2, 150))
 
         # 判定内訳
         y_pos = 200
@@ -646,140 +838,233 @@ class RhythmGame:
             "MISS": MISS_COLOR
         }
 
-        for judgment, count in self.judgments.items():
-            judgment_text = self.font_small.render(f"{judgment}: {count}", True, judgment_colors.get(judgment, WHITE))
+        for judgment, count in self.engine.judgments.items():
+            judgment_text = self.text_cache.render(self.font_small, f"{judgment}: {count}", judgment_colors.get(judgment, WHITE))
             judgment_rect = judgment_text.get_rect(center=(SCREEN_WIDTH//2, y_pos))
             self.screen.blit(judgment_text, judgment_rect)
             y_pos += 30
 
         # 精度
-        total_notes = sum(self.judgments.values())
+        total_notes = sum(self.engine.judgments.values())
         if total_notes > 0:
-            accuracy = (self.judgments["PERFECT"] * PERFECT_SCORE +
-                       self.judgments["GREAT"] * GREAT_SCORE +
-                       self.judgments["GOOD"] * GOOD_SCORE +
-                       self.judgments["BAD"] * BAD_SCORE) / (total_notes * PERFECT_SCORE) * 100
-            accuracy_text = self.font_medium.render(f"精度: {accuracy:.2f}%", True, WHITE)
+            accuracy = self.engine.accuracy() * 100
+            accuracy_text = self.text_cache.render(self.font_medium, f"精度: {accuracy:.2f}%", WHITE)
             accuracy_rect = accuracy_text.get_rect(center=(SCREEN_WIDTH//2, y_pos + 10))
             self.screen.blit(accuracy_text, accuracy_rect)
             y_pos += 50
 
         # ランク
         rank = self.calculate_rank()
-        rank_text = self.font_large.render(f"ランク: {rank}", True, WHITE)
+        rank_text = self.text_cache.render(self.font_large, f"ランク: {rank}", WHITE)
         rank_rect = rank_text.get_rect(center=(SCREEN_WIDTH//2, y_pos))
         self.screen.blit(rank_text, rank_rect)
 
         # 再プレイ案内
-        replay_text = self.font_medium.render("Rキーで再プレイ", True, WHITE)
+        replay_text = self.text_cache.render(self.font_small, "Rキーで再プレイ  Nキーで次の曲  Tキーでタイトル", WHITE)
         replay_rect = replay_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT - 100))
         self.screen.blit(replay_text, replay_rect)
 
         # 終了案内
-        quit_text = self.font_medium.render("Escキーで終了", True, WHITE)
+        quit_text = self.text_cache.render(self.font_medium, "Escキーで終了", WHITE)
         quit_rect = quit_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT - 50))
         self.screen.blit(quit_text, quit_rect)
 
+    def poll_events(self):
+        """イベントを取り出し、到着時刻（time.perf_counter）を付けて蓄える"""
+        arrival_time = time.perf_counter()
+        for event in pygame.event.get():
+            self.pending_events.append((arrival_time, event))
+
+    def wait_next_frame(self):
+        """次のフレームまで、高頻度で入力を確認しながら待つ"""
+        self.frame_deadline += FRAME_TIME
+        while True:
+            self.poll_events()
+            remaining = self.frame_deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            time.sleep(min(INPUT_POLL_INTERVAL, remaining))
+
+        # 処理が大きく遅れた場合は遅れを取り戻そうとせず、基準時刻を合わせ直す
+        now = time.perf_counter()
+        if now - self.frame_deadline > FRAME_TIME:
+            self.frame_deadline = now
+
+    def input_latencies(self):
+        """記録した入力について、到着から判定までの遅延（秒）の一覧を返す"""
+        return [handled_time - arrival_time for arrival_time, handled_time, _, _ in self.input_log]
+
     def run(self):
         """ゲームのメインループ"""
+        self.frame_deadline = time.perf_counter()
+        self.profiler.start()
         while self.running:
-            current_time = time.time()
-
-            # イベント処理
-            for event in pygame.event.get():
+            # イベント処理（到着時刻の順に処理する）
+            self.poll_events()
+            events = self.pending_events
+            self.pending_events = []
+            for arrival_time, event in events:
                 if event.type == QUIT:
                     self.running = False
 
+                elif event.type == VIDEORESIZE:
+                    self.invalidate_playfield()
+
+                elif event.type == KEYDOWN and event.key == PROFILER_KEY:
+                    self.show_profiler = not self.show_profiler
+                    self.full_redraw = True  # 差分モードでオーバーレイの跡が残らないよう全体を描き直す
+
                 elif event.type == KEYDOWN:
                     # タイトル画面
                     if self.game_state == "title":
                         if event.key == K_SPACE:
                             self.start_game()
+                        elif event.key == K_c and self.sound_bank.loaded:
+                            self.start_calibration()
+                        elif event.key == K_s:
+                            self.open_song_select()
                         elif event.key == K_ESCAPE:
                             self.running = False
 
+                    # 曲選択
+                    elif self.game_state == "select":
+                        if event.key == K_UP and self.song_list:
+                            self.song_cursor = (self.song_cursor - 1) % len(self.song_list)
+                        elif event.key == K_DOWN and self.song_list:
+                            self.song_cursor = (self.song_cursor + 1) % len(self.song_list)
+                        elif event.key in (K_RETURN, K_SPACE) and self.song_list:
+                            self.select_song(self.song_list[self.song_cursor])
+                        elif event.key == K_ESCAPE:
+                            self.game_state = "title"
+
+                    # タイミング調整
+                    elif self.game_state == "calibration":
+                        if event.key == K_SPACE:
+                            self.calibration.tap(arrival_time)
+                        elif event.key == K_ESCAPE:
+                            self.calibration = None
+                            self.game_state = "title"
+
+                    # 読み込み待ち
+                    elif self.game_state == "loading":
+                        if event.key == K_ESCAPE:
+                            self.game_state = "title"
+
                     # プレイ中
                     elif self.game_state == "playing":
                         if event.key in KEY_CONFIG:
                             lane = KEY_CONFIG[event.key]
-                            self.judge_note(lane, current_time)
+                            # フレームの時刻ではなく、キーが届いた時刻で判定する
+                            song_time = self.song_clock.song_time_at(arrival_time)
+                            self.judge_note(lane, song_time)
+                            self.input_log.append((arrival_time, time.perf_counter(), lane, song_time))
                         elif event.key == K_ESCAPE:
                             pygame.mixer.music.stop()
-                            self.game_state = "result"
+                            self.finish_game()
 
                     # リザルト画面
                     elif self.game_state == "result":
                         if event.key == K_r:
+                            self.reset_game()
+                            self.start_game()
+                        elif event.key == K_n:
+                            self.play_next_song()
+                        elif event.key == K_t:
                             self.reset_game()
                             self.game_state = "title"
                         elif event.key == K_ESCAPE:
                             self.running = False
+            self.profiler.lap(PHASE_EVENTS)
 
             # 画面描画
             if self.game_state == "title":
                 self.draw_title_screen()
 
-            elif self.game_state == "playing":
+            elif self.game_state == "select":
+                # ライブラリの更新が終わったら、カーソルの曲を保ったまま一覧を読み直す
+                if self.library_scanned.is_set():
+                    self.library_scanned.clear()
+                    current = (self.song_list[self.song_cursor]["name"] if self.song_list
+                               else os.path.basename(self.music_path))
+                    self._set_song_list(current)
+                self.draw_song_select_screen()
+
+            elif self.game_state == "loading":
+                # 譜面の準備ができたらゲームを開始
+                if self.chart_ready.is_set():
+                    self.start_game()
+                else:
+                    self.draw_loading_screen()
+
+            elif self.game_state == "calibration":
+                # 全てのクリック音を鳴らし終えたら結果を保存
+                if self.calibration.update():
+                    self.finish_calibration()
+                else:
+                    self.draw_calibration_screen()
+
+            if self.game_state == "playing":
+                # ミキサーの再生位置に合わせて時計を補正
+                self.song_clock.update()
+                song_time = self.song_clock.now()
+
                 # 見逃したノーツをチェック
-                self.check_missed_notes(current_time)
+                self.check_missed_notes(song_time)
+
+                # このフレームの判定音をまとめて鳴らす
+                self.sound_bank.flush()
+                self.profiler.lap(PHASE_MISS_CHECK)
 
                 # 画面描画
-                self.draw_playing_screen(current_time)
+                self.draw_playing_screen(song_time)
 
                 # 音楽が終了したらリザルト画面へ
                 if not pygame.mixer.music.get_busy():
-                    self.game_state = "result"
+                    self.finish_game()
 
             elif self.game_state == "result":
                 self.draw_result_screen()
+            self.profiler.lap(PHASE_DRAW)
+
+            # フレーム時間のオーバーレイ
+            if self.show_profiler:
+                overlay_rect = self.profiler.draw_overlay(self.screen)
+                if self.update_rects is not None:
+                    self.update_rects.append(overlay_rect)
+                if self.dirty_rect_mode and self.game_state == "playing":
+                    self.dirty_rects.append(overlay_rect)  # 次のフレームでプレイフィールドを描き戻す
+                self.profiler.lap(PHASE_OVERLAY)
+
+            if self.update_rects is not None:
+                pygame.display.update(self.update_rects)
+                self.update_rects = None
+            else:
+                pygame.display.flip()
+            self.profiler.lap(PHASE_FLIP)
+            self.startup_timer.finish("first_frame")
+
+            self.wait_next_frame()
+            self.profiler.lap(PHASE_WAIT)
+            self.profiler.end_frame()
 
-            pygame.display.flip()
-            self.clock.tick(FPS)
+        # フレーム時間の計測結果を書き出す
+        if self.profile_export_file:
+            try:
+                self.profiler.export(self.profile_export_file)
+                print(f"フレーム時間の計測結果を {self.profile_export_file} に保存しました")
+            except OSError as e:
+                print(f"フレーム時間の計測結果の保存に失敗しました: {e}")
 
         pygame.quit()
         sys.exit()
 
 # メイン処理
 if __name__ == "__main__":
-    # 効果音ディレクトリの作成
-    sounds_dir = os.path.join(os.path.dirname(__file__), "sounds")
-    os.makedirs(sounds_dir, exist_ok=True)
-
-    # 効果音ファイルの生成
-    def generate_sound(filename, freq, duration):
-        try:
-            import math
-            import numpy as np
-            import wave
-            import struct
-
-            sample_rate = 44100
-            t = np.linspace(0, duration, int(sample_rate * duration), False)
-            wave_data = np.sin(2 * np.pi * freq * t) * 32767
-            wave_data = np.int16(wave_data)
-
-            # WAVファイルとして保存
-            with wave.open(os.path.join(sounds_dir, filename), 'w') as wf:
-                wf.setnchannels(1)  # モノラル
-                wf.setsampwidth(2)  # 16ビット
-                wf.setframerate(sample_rate)
-                wf.writeframes(wave_data.tobytes())
-            return True
-        except Exception as e:
-            print(f"効果音の生成に失敗しました: {e}")
-            return False
-
-    # 効果音が存在しない場合は生成
-    if not os.path.exists(os.path.join(sounds_dir, "perfect.wav")):
-        generate_sound("perfect.wav", 880, 0.1)
-    if not os.path.exists(os.path.join(sounds_dir, "great.wav")):
-        generate_sound("great.wav", 660, 0.1)
-    if not os.path.exists(os.path.join(sounds_dir, "good.wav")):
-        generate_sound("good.wav", 440, 0.1)
-    if not os.path.exists(os.path.join(sounds_dir, "bad.wav")):
-        generate_sound("bad.wav", 220, 0.1)
-    if not os.path.exists(os.path.join(sounds_dir, "miss.wav")):
-        generate_sound("miss.wav", 110, 0.1)
+    import argparse
+    parser = argparse.ArgumentParser(description="リズムゲーム")
+    parser.add_argument("--profile-export", metavar="PATH",
+                        help="終了時にフレーム時間の計測結果を書き出すファイル（拡張子 .csv / .json で形式を選ぶ）")
+    args = parser.parse_args()
 
     # 背景画像のコピー
     background_src = os.path.join("images", "game_background.gif")
@@ -801,7 +1086,7 @@ if __name__ == "__main__":
         print(f"sample_musicディレクトリを作成しました: {sample_music_dir}")
     
     # 音楽ファイルの確認
-    default_music_path = os.path.join(sample_music_dir, "jpop_rhythm_game.mp3")
+    default_music_path = os.path.join(sample_music_dir, DEFAULT_MUSIC_FILE)
     if not os.path.exists(default_music_path):
         print(f"デフォルトの音楽ファイルが見つかりません: {default_music_path}")
         # MP3ファイルを探す
@@ -812,7 +1097,7 @@ if __name__ == "__main__":
 
     # ゲーム開始
     try:
-        game = RhythmGame()
+        game = RhythmGame(profile_export_file=args.profile_export)
         game.run()
     except Exception as e:
         print(f"ゲーム実行中にエラーが発生しました: {e}")
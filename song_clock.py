@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+楽曲時計
+ミキサーの再生位置（pygame.mixer.music.get_pos）を基準に、time.perf_counter() で補間した
+楽曲内の経過時間を求める。再生位置はバッファ単位でしか進まないため、誤差を平滑化して
+少しずつ補正し、音ズレ（ドリフト）を吸収する
+"""
+
+import os
+import json
+import bisect
+import time
+
+import pygame
+
+# 設定ファイル（音声と映像のオフセットを保存する）
+SETTINGS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "settings.json")
+
+# 補正の設定
+CLOCK_SMOOTHING = 0.05          # 1回の更新で誤差のどれだけを補正するか
+CLOCK_MAX_STEP = 0.002          # 1回の更新で補正する最大量（秒）
+CLOCK_RESYNC_THRESHOLD = 0.1    # これ以上ずれたら平滑化せずに合わせ直す（秒）
+
+# キャリブレーションの設定
+CALIBRATION_INTERVAL = 0.5      # クリック音の間隔（秒）
+CALIBRATION_BEATS = 16          # クリック音の回数
+CALIBRATION_MIN_TAPS = 8        # オフセットを計算するのに必要なタップ数
+
+
+def load_audio_offset():
+    """保存されている音声オフセット（秒）を読み込む"""
+    try:
+        with open(SETTINGS_FILE, "r") as f:
+            return float(json.load(f).get("audio_offset", 0.0))
+    except (OSError, ValueError, AttributeError):
+        return 0.0
+
+
+def save_audio_offset(audio_offset):
+    """音声オフセット（秒）を設定ファイルに保存する"""
+    settings = {}
+    try:
+        with open(SETTINGS_FILE, "r") as f:
+            settings = json.load(f)
+    except (OSError, ValueError):
+        pass
+    settings["audio_offset"] = audio_offset
+    try:
+        with open(SETTINGS_FILE, "w") as f:
+            json.dump(settings, f, ensure_ascii=False, indent=2)
+    except OSError as e:
+        print(f"設定ファイルの保存に失敗しました: {e}")
+
+
+class SongClock:
+    """ミキサーの再生位置に同期した楽曲時計"""
+    def __init__(self, audio_offset=0.0):
+        self.audio_offset = audio_offset  # 音声が実際に聞こえるまでの遅れ（秒）
+        self.start_perf = time.perf_counter()
+        self.correction = 0.0
+
+    def start(self):
+        """再生開始に合わせて時計をリセットする"""
+        self.start_perf = time.perf_counter()
+        self.correction = 0.0
+
+    def update(self):
+        """ミキサーの再生位置との誤差を補正する（毎フレーム呼び出す）"""
+        position_ms = pygame.mixer.music.get_pos()
+        if position_ms < 0:
+            return
+        error = position_ms / 1000.0 - self._raw_time(time.perf_counter())
+        if abs(error) > CLOCK_RESYNC_THRESHOLD:
+            self.correction += error
+        else:
+            step = error * CLOCK_SMOOTHING
+            self.correction += max(-CLOCK_MAX_STEP, min(CLOCK_MAX_STEP, step))
+
+    def _raw_time(self, perf_time):
+        """補正済みのミキサー再生位置（秒）"""
+        return perf_time - self.start_perf + self.correction
+
+    def song_time_at(self, perf_time):
+        """time.perf_counter() の値を楽曲内の経過時間（秒）に変換する"""
+        return self._raw_time(perf_time) - self.audio_offset
+
+    def now(self):
+        """現在の楽曲内の経過時間（秒）"""
+        return self.song_time_at(time.perf_counter())
+
+
+class Calibration:
+    """一定間隔のクリック音に合わせたタップから音声オフセットを測定する
+
+    タップは実際にクリック音を鳴らした時刻（play() を呼んだ直後の time.perf_counter()）と比べる。
+    クリック音はフレームの処理に合わせて鳴らすので、予定時刻より最大1フレーム遅れる
+    """
+    def __init__(self, click_sound):
+        self.click_sound = click_sound
+        self.start_perf = time.perf_counter() + CALIBRATION_INTERVAL
+        self.click_times = []  # 実際にクリック音を鳴らした時刻
+        self.taps = []         # タップの時刻
+
+    @property
+    def clicks_played(self):
+        return len(self.click_times)
+
+    def update(self):
+        """予定時刻になったクリック音を鳴らす。全て鳴らし終えたら True"""
+        now = time.perf_counter()
+        if (self.clicks_played < CALIBRATION_BEATS and
+                now >= self.start_perf + self.clicks_played * CALIBRATION_INTERVAL):
+            # 遅れて複数のクリック音が予定時刻を過ぎていても、まとめて鳴らさず1回だけ鳴らす
+            self.click_sound.play()
+            self.click_times.append(time.perf_counter())
+        return (self.clicks_played >= CALIBRATION_BEATS and
+                now >= self.start_perf + CALIBRATION_BEATS * CALIBRATION_INTERVAL)
+
+    def tap(self, perf_time):
+        """タップを記録する（クリック音より先に押されることもあるので、クリック音との対応は result で求める）"""
+        self.taps.append(perf_time)
+
+    def tap_errors(self):
+        """タップごとの、最も近いクリック音との時間差（クリック音の間隔の半分より離れたタップは除く）"""
+        errors = []
+        for perf_time in self.taps:
+            k = bisect.bisect_left(self.click_times, perf_time)
+            nearby = self.click_times[max(k - 1, 0):k + 1]
+            if not nearby:
+                continue
+            error = min((perf_time - click for click in nearby), key=abs)
+            if abs(error) <= CALIBRATION_INTERVAL / 2:
+                errors.append(error)
+        return errors
+
+    def result(self):
+        """測定したオフセット（タップの遅れの中央値）。タップが足りなければ None"""
+        errors = sorted(self.tap_errors())
+        if len(errors) < CALIBRATION_MIN_TAPS:
+            return None
+        middle = len(errors) // 2
+        if len(errors) % 2:
+            return errors[middle]
+        return (errors[middle - 1] + errors[middle]) / 2
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+曲のライブラリ
+sample_music/ の曲ごとに、サイズ・更新時刻・再生時間・BPM・譜面の場所を SQLite に記録する。
+スキャン時はディレクトリを一覧してサイズと更新時刻を比べ、変わった曲だけを調べ直すため、
+一度記録した後は曲が数千あってもすぐに終わる。選択中の曲もここに保存する
+"""
+
+import os
+import sqlite3
+
+from audio_probe import get_duration
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MUSIC_DIR = os.path.join(BASE_DIR, "sample_music")
+CHARTS_DIR = os.path.join(BASE_DIR, "charts")  # batch_generate.py の出力先
+LIBRARY_FILE = os.path.join(BASE_DIR, ".cache", "library.sqlite3")
+MUSIC_EXTENSIONS = (".mp3", ".ogg", ".wav")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS songs (
+    name TEXT PRIMARY KEY,      -- 音楽ファイル名（MUSIC_DIR からの相対パス）
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    duration REAL,              -- 再生時間（秒、取得できなければ NULL）
+    bpm REAL,                   -- 譜面またはビート解析の BPM（不明なら NULL）
+    chart TEXT,                 -- 譜面ファイル名（CHARTS_DIR からの相対パス、なければ NULL）
+    chart_mtime_ns INTEGER
+);
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class SongLibrary:
+    """曲の一覧を SQLite に記録するクラス（呼び出しごとに接続するので複数のスレッドから使える）"""
+    def __init__(self, music_dir=MUSIC_DIR, charts_dir=CHARTS_DIR, library_file=LIBRARY_FILE):
+        self.music_dir = music_dir
+        self.charts_dir = charts_dir
+        self.library_file = library_file
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.library_file), exist_ok=True)
+        connection = sqlite3.connect(self.library_file)
+        connection.row_factory = sqlite3.Row
+        connection.executescript(SCHEMA)
+        return connection
+
+    def _chart_mtimes(self):
+        """譜面ディレクトリの譜面ファイル名と更新時刻"""
+        try:
+            return {entry.name: entry.stat().st_mtime_ns for entry in os.scandir(self.charts_dir)
+                    if entry.name.endswith(".bin") and entry.is_file()}
+        except OSError:
+            return {}
+
+    def _read_chart_bpm(self, chart_file):
+        """譜面ファイルのヘッダから BPM を読む（読めなければ None）"""
+        from beatmap_format import load_binary, BeatmapFormatError
+        try:
+            return load_binary(os.path.join(self.charts_dir, chart_file))["bpm"] or None
+        except (OSError, ValueError, BeatmapFormatError):
+            return None
+
+    def scan(self):
+        """音楽ディレクトリを調べてライブラリを更新し、(追加・更新した曲数, 削除した曲数) を返す"""
+        try:
+            entries = [entry for entry in os.scandir(self.music_dir)
+                       if entry.name.lower().endswith(MUSIC_EXTENSIONS) and entry.is_file()]
+        except OSError as e:
+            print(f"音楽ディレクトリを読めません: {e}")
+            return 0, 0
+        chart_mtimes = self._chart_mtimes()
+
+        with self._connect() as connection:
+            known = {row["name"]: row for row in connection.execute("SELECT * FROM songs")}
+            updates = []
+            for entry in entries:
+                stat = entry.stat()
+                chart_file = os.path.splitext(entry.name)[0] + ".bin"
+                chart_mtime_ns = chart_mtimes.get(chart_file)
+                row = known.pop(entry.name, None)
+
+                # サイズ・更新時刻と譜面の更新時刻が同じなら調べ直さない
+                audio_changed = row is None or (row["size"], row["mtime_ns"]) != (stat.st_size, stat.st_mtime_ns)
+                chart_changed = row is None or row["chart_mtime_ns"] != chart_mtime_ns
+                if not audio_changed and not chart_changed:
+                    continue
+
+                duration = get_duration(entry.path) if audio_changed else row["duration"]
+                bpm = None if audio_changed else row["bpm"]
+                if chart_mtime_ns is not None and chart_changed:
+                    bpm = self._read_chart_bpm(chart_file) or bpm
+                updates.append((entry.name, stat.st_size, stat.st_mtime_ns, duration, bpm,
+                                chart_file if chart_mtime_ns is not None else None, chart_mtime_ns))
+
+            connection.executemany("INSERT OR REPLACE INTO songs VALUES (?, ?, ?, ?, ?, ?, ?)", updates)
+            connection.executemany("DELETE FROM songs WHERE name = ?", [(name,) for name in known])
+        connection.close()
+        return len(updates), len(known)
+
+    def songs(self):
+        """記録されている曲を名前順に辞書のリストで返す"""
+        with self._connect() as connection:
+            rows = [dict(row) for row in connection.execute("SELECT * FROM songs ORDER BY name")]
+        connection.close()
+        return rows
+
+    def song(self, name):
+        """名前から曲を返す（なければ None）"""
+        with self._connect() as connection:
+            row = connection.execute("SELECT * FROM songs WHERE name = ?", (name,)).fetchone()
+        connection.close()
+        return dict(row) if row else None
+
+    def set_bpm(self, name, bpm):
+        """ビート解析で求めた BPM を記録する"""
+        with self._connect() as connection:
+            connection.execute("UPDATE songs SET bpm = ? WHERE name = ?", (bpm, name))
+        connection.close()
+
+    def music_path(self, song):
+        return os.path.join(self.music_dir, song["name"])
+
+    def chart_path(self, song):
+        """曲の譜面ファイルのパス（なければ None）"""
+        return os.path.join(self.charts_dir, song["chart"]) if song and song["chart"] else None
+
+    def selected(self):
+        """選択中の曲の名前（未選択なら None）"""
+        with self._connect() as connection:
+            row = connection.execute("SELECT value FROM state WHERE key = 'selected_song'").fetchone()
+        connection.close()
+        return row["value"] if row else None
+
+    def select(self, name):
+        """選択中の曲を保存する"""
+        with self._connect() as connection:
+            connection.execute("INSERT OR REPLACE INTO state VALUES ('selected_song', ?)", (name,))
+        connection.close()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+効果音の管理
+効果音はファイルを介さずにメモリ上で合成し（pygame.sndarray）、判定音ごとに専用のミキサーチャンネルを
+予約して再生する。同じフレームで同じ種類の効果音が何度鳴らされても、まとめて1回だけ再生する。
+sounds/ に同じ名前の WAV ファイルを置くと、合成した音の代わりにそれを使う
+"""
+
+import os
+
+import numpy as np
+import pygame
+
+SOUNDS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sounds")
+
+# ミキサーの設定（バッファを小さくすると効果音の遅延が減るが、音が途切れる環境では大きくする）
+MIXER_FREQUENCY = 44100
+MIXER_SIZE = -16
+MIXER_CHANNELS = 2
+MIXER_BUFFER_SIZE = 256
+
+# 効果音（名前, 周波数, 長さ）
+SOUND_EFFECTS = [
+    ("perfect", 880, 0.1),
+    ("great", 660, 0.1),
+    ("good", 440, 0.1),
+    ("bad", 220, 0.1),
+    ("miss", 110, 0.1),
+]
+
+
+def pre_init_mixer(buffer_size=MIXER_BUFFER_SIZE):
+    """pygame.mixer.init() の前に呼び、ミキサーのバッファサイズなどを設定する"""
+    pygame.mixer.pre_init(MIXER_FREQUENCY, MIXER_SIZE, MIXER_CHANNELS, buffer_size)
+
+
+def synthesize_tone(freq, duration):
+    """ミキサーの形式に合わせて正弦波の Sound をメモリ上で作る"""
+    sample_rate, size, channels = pygame.mixer.get_init()
+    t = np.arange(int(sample_rate * duration)) / sample_rate
+    wave = np.sin(2 * np.pi * freq * t)
+
+    # ミキサーのサンプル形式に変換（size が負なら符号付き整数、32 なら浮動小数点）
+    if size == 32:
+        samples = wave.astype(np.float32)
+    else:
+        bits = abs(size)
+        amplitude = 2 ** (bits - 1) - 1
+        if size < 0:
+            samples = (wave * amplitude).astype(np.int16 if bits == 16 else np.int8)
+        else:
+            samples = (wave * amplitude + amplitude + 1).astype(np.uint16 if bits == 16 else np.uint8)
+
+    if channels > 1:
+        samples = np.ascontiguousarray(np.repeat(samples[:, np.newaxis], channels, axis=1))
+    return pygame.sndarray.make_sound(samples)
+
+
+class DummySound:
+    """効果音が使えない場合のダミー"""
+    def play(self): pass
+
+
+class SoundEffect:
+    """予約したチャンネルで再生する効果音"""
+    def __init__(self, sound, channel):
+        self.sound = sound
+        self.channel = channel
+
+    def play(self):
+        # 同じ種類の音が鳴っていれば止めて鳴らし直す
+        self.channel.play(self.sound)
+
+
+class SoundBank:
+    """効果音をまとめて管理するクラス"""
+    def __init__(self, sounds_dir=SOUNDS_DIR):
+        self.sounds_dir = sounds_dir
+        self.effects = {name: DummySound() for name, _, _ in SOUND_EFFECTS}
+        self.pending = {}   # このフレームで鳴らす効果音（名前 → True、順序を保つため辞書を使う）
+        self.loaded = False
+
+    def load(self):
+        """効果音を合成し（sounds/ に WAV があればそれを読み込み）、専用のチャンネルを予約する"""
+        try:
+            if pygame.mixer.get_num_channels() < len(SOUND_EFFECTS):
+                pygame.mixer.set_num_channels(len(SOUND_EFFECTS))
+            pygame.mixer.set_reserved(len(SOUND_EFFECTS))
+
+            for channel_id, (name, freq, duration) in enumerate(SOUND_EFFECTS):
+                custom_path = os.path.join(self.sounds_dir, name + ".wav")
+                if os.path.exists(custom_path):
+                    sound = pygame.mixer.Sound(custom_path)
+                else:
+                    sound = synthesize_tone(freq, duration)
+                self.effects[name] = SoundEffect(sound, pygame.mixer.Channel(channel_id))
+            self.loaded = True
+        except (pygame.error, OSError, ValueError) as e:
+            print(f"効果音の準備に失敗しました: {e}")
+
+    def trigger(self, name):
+        """効果音を鳴らす予約をする（flush で同じ種類は1回だけ鳴らす）"""
+        self.pending[name] = True
+
+    def flush(self):
+        """予約された効果音を鳴らす（毎フレーム呼び出す）"""
+        if not self.pending:
+            return
+        for name in self.pending:
+            self.effects[name].play()
+        self.pending.clear()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+起動時間の計測
+起動処理を区間（モジュールの読み込み・pygame の初期化・フォント・最初のフレームなど）に分けて計測し、
+合計が目標時間を超えた場合は内訳を表示する
+"""
+
+import time
+
+STARTUP_BUDGET = 1.0  # 起動にかける目標時間（秒、最初のフレームを表示するまで）
+
+
+class StartupTimer:
+    """起動処理の区間ごとの時間を記録するクラス"""
+    def __init__(self, start_time=None, budget=STARTUP_BUDGET):
+        self.start_time = time.perf_counter() if start_time is None else start_time
+        self.last_time = self.start_time
+        self.budget = budget
+        self.phases = []  # (区間名, 秒)
+        self.finished = False
+
+    def mark(self, name):
+        """前回の区切りからの時間を name の区間として記録する"""
+        now = time.perf_counter()
+        self.phases.append((name, now - self.last_time))
+        self.last_time = now
+
+    def total(self):
+        return self.last_time - self.start_time
+
+    def finish(self, name):
+        """最後の区間を記録して結果を表示する（2回目以降は何もしない）"""
+        if self.finished:
+            return
+        self.mark(name)
+        self.finished = True
+
+        total = self.total()
+        if total <= self.budget:
+            print(f"起動時間: {total * 1000:.0f} ms")
+            return
+        print(f"警告: 起動時間 {total * 1000:.0f} ms が目標の {self.budget * 1000:.0f} ms を超えました")
+        for phase, elapsed in self.phases:
+            print(f"  {phase:<12} {elapsed * 1000:8.1f} ms")
+
+    def as_dict(self):
+        """区間ごとの時間（ミリ秒）を返す"""
+        return {name: elapsed * 1000 for name, elapsed in self.phases}
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+beatmap_format.py のテスト（python -m pytest tests）
+"""
+
+import os
+import sys
+import json
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from beatmap_format import json_to_binary, load_chart
+
+BEATMAP = {
+    "music_file": "song.mp3",
+    "bpm": 120,
+    "timing_points": [{"time": 0.0}, {"time": 10.0, "bpm": 240}],
+    "notes": [{"time": 12.0, "lane": 3}, {"time": 5.0, "lane": 1}],
+}
+
+
+@pytest.fixture
+def beatmap_files(tmp_path):
+    json_path = str(tmp_path / "beatmap.json")
+    with open(json_path, "w") as f:
+        json.dump(BEATMAP, f)
+    binary_path = str(tmp_path / "beatmap.bin")
+    json_to_binary(json_path, binary_path)
+    return json_path, binary_path
+
+
+def test_json_and_binary_give_the_same_chart(beatmap_files):
+    json_chart, binary_chart = (load_chart(path, 4) for path in beatmap_files)
+    assert json_chart.content_hash() == binary_chart.content_hash()
+    for notes in (json_chart, binary_chart):
+        assert notes.time.tolist() == [5.0, 12.0]
+        assert notes.lane.tolist() == [1, 3]
+        # タイミングポイントのテンポ変化がノーツの位置に反映される
+        assert notes.timeline.bpm_at(11.0) == 240.0
+        assert notes.position.tolist() == pytest.approx([5.0, 14.0])
+
+
+def test_chart_for_another_song_is_not_used(beatmap_files):
+    for path in beatmap_files:
+        assert load_chart(path, 4, "/music/song.mp3") is not None
+        assert load_chart(path, 4, "/music/other.mp3") is None
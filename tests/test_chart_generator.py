@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+chart_generator.py のテスト（python -m pytest tests）
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import chart_generator
+from chart_generator import DIFFICULTIES, generate_charts, _detect_beats_offline, _detect_beats_streaming
+
+SAMPLE_MUSIC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                            "sample_music", "jpop_rhythm_game.mp3")
+
+# 2 秒（CHART_START_TIME）から 0.5 秒おきのビート
+BEAT_TIMES = 2.0 + 0.5 * np.arange(200)
+BEAT_STRENGTHS = np.random.default_rng(0).random(200)
+MUSIC_LENGTH = 200.0
+LANE_COUNT = 4
+
+
+def write_click_track(path, duration=40.0, bpm=128.0, sr=44100):
+    """一定のテンポのクリック音とノイズのステレオ WAV を書き出す"""
+    soundfile = pytest.importorskip("soundfile")
+    rng = np.random.default_rng(0)
+    y = rng.normal(0.0, 0.01, int(duration * sr))
+    click = np.sin(2 * np.pi * 1000 * np.arange(int(0.03 * sr)) / sr) * np.hanning(int(0.03 * sr))
+    for beat, start in enumerate(np.arange(0.5, duration - 0.1, 60.0 / bpm)):
+        i = int(start * sr)
+        y[i:i + len(click)] += click * (0.8 if beat % 4 == 0 else 0.4)
+    soundfile.write(path, np.stack([y, y * 0.5], axis=1).astype(np.float32), sr)
+
+
+def assert_same_beats(music_path):
+    offline_tempo, offline_beats, offline_strengths = _detect_beats_offline(music_path)
+    streaming_tempo, streaming_beats, streaming_strengths = _detect_beats_streaming(music_path)
+    assert streaming_tempo == pytest.approx(offline_tempo)
+    assert len(streaming_beats) == len(offline_beats)
+    assert np.allclose(streaming_beats, offline_beats)
+    assert np.allclose(streaming_strengths, offline_strengths, rtol=1e-3, atol=1e-3)
+
+
+def test_streaming_matches_offline_analysis(tmp_path, monkeypatch):
+    pytest.importorskip("librosa")
+    music_path = str(tmp_path / "clicks.wav")
+    write_click_track(music_path)
+    # ブロックを小さくして、ブロックの境目を多く含める
+    monkeypatch.setattr(chart_generator, "STREAM_BLOCK_FRAMES", 37)
+    assert_same_beats(music_path)
+
+
+@pytest.mark.skipif(not os.path.exists(SAMPLE_MUSIC), reason="サンプルの曲がありません")
+def test_streaming_matches_offline_analysis_for_mp3():
+    pytest.importorskip("librosa")
+    assert_same_beats(SAMPLE_MUSIC)
+
+
+def make_charts(difficulties=DIFFICULTIES, seed=7):
+    return generate_charts(BEAT_TIMES, BEAT_STRENGTHS, MUSIC_LENGTH, LANE_COUNT, difficulties, seed)
+
+
+def chart_notes(chart):
+    """譜面を {(ビート番号, レーン)} の集合にする"""
+    lanes, times = chart
+    beats = np.rint((times - BEAT_TIMES[0]) / 0.5).astype(int)
+    return set(zip(beats.tolist(), lanes.tolist()))
+
+
+def test_same_seed_gives_same_chart_whichever_difficulties_are_requested():
+    all_charts = make_charts()
+    for names in (["hard"], ["normal"], ["hard", "easy"]):
+        charts = make_charts({name: DIFFICULTIES[name] for name in names})
+        assert list(charts) == names
+        for name in names:
+            assert np.array_equal(charts[name][0], all_charts[name][0])
+            assert np.array_equal(charts[name][1], all_charts[name][1])
+    assert chart_notes(make_charts(seed=8)["normal"]) != chart_notes(all_charts["normal"])
+
+
+def test_lower_difficulties_are_subsets_of_higher_ones():
+    charts = make_charts()
+    easy, normal, hard = (chart_notes(charts[name]) for name in ("easy", "normal", "hard"))
+    assert easy < normal < hard
+    # hard は全てのビートにノーツがある
+    assert {beat for beat, _ in hard} == set(range(len(BEAT_TIMES)))
+
+
+def test_pattern_rules():
+    for name, chart in make_charts().items():
+        lanes_at = {}
+        for beat, lane in sorted(chart_notes(chart)):
+            lanes_at.setdefault(beat, []).append(lane)
+
+        previous_lane = None
+        for beat in sorted(lanes_at):
+            lanes = lanes_at[beat]
+            if beat % 16 == 0:
+                assert lanes == list(range(LANE_COUNT)), (name, beat)
+            elif beat % 8 == 0:
+                assert lanes == [(beat // 8) % LANE_COUNT], (name, beat)
+            elif beat % 4 == 0:
+                assert lanes == [(beat // 4) % 2 * 2, (beat // 4) % 2 * 2 + 1], (name, beat)
+            else:
+                # その他のビートは1つだけで、直前のノーツと同じレーンにはならない
+                assert len(lanes) == 1 and lanes[0] != previous_lane, (name, beat)
+            previous_lane = lanes[-1]
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+note_chart.py のテスト（python -m pytest tests）
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from note_chart import NoteChart, NOTE_PENDING, JUDGMENT_CODES, JUDGMENT_NONE
+
+
+def test_window_includes_both_edges():
+    chart = NoteChart([0], [10.0], 4)
+    assert chart.find_closest(0, 9.75, 0.25) == 0
+    assert chart.find_closest(0, 10.25, 0.25) == 0
+    assert chart.find_closest(0, 9.7499, 0.25) == -1
+    assert chart.find_closest(0, 10.2501, 0.25) == -1
+
+
+def test_closest_pending_note_is_chosen():
+    chart = NoteChart([0, 0, 0], [10.0, 10.5, 11.0], 4)
+    assert chart.find_closest(0, 10.3, 0.5) == 1
+    # 同じ距離なら早いノーツ
+    assert chart.find_closest(0, 10.25, 0.5) == 0
+    chart.judge(1, "GREAT")
+    assert chart.find_closest(0, 10.8, 0.5) == 2
+    chart.judge(2, "GOOD")
+    assert chart.find_closest(0, 10.5, 0.5) == 0
+
+
+def test_same_time_notes_in_different_lanes_are_judged_separately():
+    chart = NoteChart([2, 0, 1], [5.0, 5.0, 5.0], 4)
+    indices = [chart.find_closest(lane, 5.0, 0.1) for lane in range(3)]
+    assert sorted(indices) == [0, 1, 2]
+    assert [int(chart.lane[index]) for index in indices] == [0, 1, 2]
+    assert chart.find_closest(3, 5.0, 0.1) == -1
+
+    chart.judge(indices[1], "PERFECT")
+    assert chart.find_closest(1, 5.0, 0.1) == -1
+    assert chart.find_closest(0, 5.0, 0.1) == indices[0]
+    assert chart.find_closest(2, 5.0, 0.1) == indices[2]
+
+
+def test_sweep_misses_only_pending_notes_and_advances_cursor():
+    chart = NoteChart([0, 0, 1, 0], [1.0, 2.0, 2.0, 3.0], 4)
+    chart.judge(1, "PERFECT")
+
+    # 2.5 より前のうち、未判定のノーツだけが MISS になる
+    assert chart.sweep_misses(2.5) == 2
+    assert chart.judgment.tolist() == [JUDGMENT_CODES["MISS"], JUDGMENT_CODES["PERFECT"],
+                                       JUDGMENT_CODES["MISS"], JUDGMENT_NONE]
+    assert chart.lane_cursors[:2] == [2, 1]
+    # 同じ範囲を何度調べても数え直さない
+    assert chart.sweep_misses(2.5) == 0
+
+    # MISS にしたノーツは判定の対象にならず、次のノーツが選ばれる
+    assert chart.find_closest(0, 1.0, 0.1) == -1
+    assert chart.find_closest(0, 2.0, 1.0) == 3
+
+    chart.reset()
+    assert (chart.state == NOTE_PENDING).all()
+    assert chart.find_closest(0, 1.0, 0.1) == 0
+
+
+def test_visible_notes_are_culled_at_the_start_of_the_song():
+    chart = NoteChart([0, 1, 2, 3], [0.0, 1.0, 2.0, 5.0], 4)
+    lanes, ys = chart.visible_notes(0.0, 2.0, 0.5, 500, 100)
+    assert lanes.tolist() == [0, 1, 2]
+    assert ys.tolist() == pytest.approx([500.0, 400.0, 300.0])
+
+    # 曲の開始前は、画面の上端ちょうどのノーツまで表示する
+    lanes, ys = chart.visible_notes(-2.0, 2.0, 0.5, 500, 100)
+    assert lanes.tolist() == [0]
+    assert ys.tolist() == pytest.approx([300.0])
+    assert len(chart.visible_notes(-2.1, 2.0, 0.5, 500, 100)[0]) == 0
+
+
+def test_visible_notes_are_culled_at_the_end_of_the_song():
+    chart = NoteChart([0, 1, 2], [1.0, 9.0, 10.0], 4)
+    chart.judge(1, "GOOD")
+
+    # 判定済みのノーツは表示しない
+    lanes, ys = chart.visible_notes(9.5, 2.0, 0.5, 500, 100)
+    assert lanes.tolist() == [2]
+    assert ys.tolist() == pytest.approx([450.0])
+
+    # 最後のノーツは画面の下端を過ぎるまで表示し、その後は何も表示しない
+    lanes, ys = chart.visible_notes(10.5, 2.0, 0.5, 500, 100)
+    assert lanes.tolist() == [2]
+    assert ys.tolist() == pytest.approx([550.0])
+    assert len(chart.visible_notes(10.6, 2.0, 0.5, 500, 100)[0]) == 0
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+replay.py のテスト（python -m pytest tests）
+"""
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import replay
+from game_engine import JudgeEngine, autoplay_inputs, synthetic_chart
+from replay import ReplayRecorder, load_replay, new_replay_path, replay_chart, run_replay
+
+
+def test_new_replay_path_does_not_reuse_existing_names(tmp_path, monkeypatch):
+    monkeypatch.setattr(replay, "REPLAY_DIR", str(tmp_path))
+    monkeypatch.setattr(replay.time, "time", lambda: 1700000000.123)
+
+    paths = []
+    for _ in range(3):
+        path = new_replay_path()
+        open(path, "wb").close()
+        paths.append(os.path.basename(path))
+
+    assert paths[0].endswith("_123.rpl")
+    assert paths[1].endswith("_123_1.rpl")
+    assert paths[2].endswith("_123_2.rpl")
+
+
+def play_and_record(notes, inputs, seed=0):
+    """ゲームと同じ順序で、フレームごとの見逃し判定とキー入力の判定を行いながら入力を記録する
+
+    入力はフレームの区切りで届き、楽曲時間はそのフレームの見逃し判定より前になることもある
+    """
+    rng = np.random.default_rng(seed)
+    engine = JudgeEngine(notes)
+    recorder = ReplayRecorder()
+    frame_time = 0.0
+    i = 0
+    while i < len(inputs):
+        frame_time += 1 / 60 + rng.uniform(-0.004, 0.004)
+        while i < len(inputs) and inputs[i][0] < frame_time:
+            song_time, lane = inputs[i]
+            song_time -= rng.uniform(0.0, 0.03)  # 入力の遅延の補正で、済ませた見逃し判定より前になることがある
+            recorder.record(song_time, lane, engine.swept_until)
+            engine.sweep_misses(song_time)
+            engine.judge(lane, song_time)
+            i += 1
+        engine.sweep_misses(frame_time)
+    engine.sweep_misses(frame_time + 1.0)
+    return engine, recorder
+
+
+def test_saved_replay_reproduces_the_result(tmp_path):
+    notes = synthetic_chart(2000, seed=3)
+    inputs = autoplay_inputs(notes, offset=0.01, jitter=0.05, seed=4)
+    # 一部のノーツは押さずに見逃す
+    inputs = [item for k, item in enumerate(inputs) if k % 17 != 0]
+    engine, recorder = play_and_record(notes, inputs)
+    recorded = engine.result()
+    assert recorded["judgments"]["MISS"] > 0 and recorded["judgments"]["PERFECT"] > 0
+
+    path = str(tmp_path / "play.rpl")
+    recorder.save(path, notes, engine, "song.mp3")
+    replay_data = load_replay(path)
+    assert replay_data["music_file"] == "song.mp3"
+    assert replay_data["chart_hash"] == notes.content_hash()
+
+    result = run_replay(replay_chart(replay_data), replay_data)
+    for key in ("score", "max_combo", "judgments"):
+        assert result[key] == recorded[key]
+    assert replay_data["result"] == {key: recorded[key] for key in ("score", "max_combo", "judgments")}
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+song_clock.py のテスト（python -m pytest tests）
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import song_clock
+from song_clock import Calibration, CALIBRATION_BEATS, CALIBRATION_INTERVAL
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeSound:
+    def __init__(self):
+        self.played = 0
+
+    def play(self):
+        self.played += 1
+
+
+def test_taps_are_measured_against_actual_click_times(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(song_clock.time, "perf_counter", clock)
+    sound = FakeSound()
+    calibration = Calibration(sound)
+
+    # クリック音は予定より 30 ms 遅れて鳴り、タップは実際のクリック音の 20 ms 後
+    for beat in range(CALIBRATION_BEATS):
+        clock.now = calibration.start_perf + beat * CALIBRATION_INTERVAL + 0.03
+        assert not calibration.update()
+        calibration.tap(clock.now + 0.02)
+    clock.now = calibration.start_perf + CALIBRATION_BEATS * CALIBRATION_INTERVAL
+    assert calibration.update()
+
+    assert sound.played == CALIBRATION_BEATS
+    assert calibration.result() == pytest.approx(0.02)
+
+
+def test_early_tap_matches_the_following_click(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(song_clock.time, "perf_counter", clock)
+    calibration = Calibration(FakeSound())
+
+    # クリック音が鳴る前のタップも、後から鳴ったクリック音と対応づける
+    for beat in range(CALIBRATION_BEATS):
+        calibration.tap(calibration.start_perf + beat * CALIBRATION_INTERVAL - 0.01)
+        clock.now = calibration.start_perf + beat * CALIBRATION_INTERVAL
+        calibration.update()
+
+    assert calibration.result() == pytest.approx(-0.01)
+
+
+def test_too_few_taps_give_no_result(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(song_clock.time, "perf_counter", clock)
+    calibration = Calibration(FakeSound())
+    clock.now = calibration.start_perf
+    calibration.update()
+    calibration.tap(clock.now)
+    assert calibration.result() is None
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+timing_timeline.py のテスト（python -m pytest tests）
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from beatmap_format import TIMING_DTYPE
+from note_chart import NoteChart
+from timing_timeline import TimingTimeline
+
+
+def make_records(points):
+    records = np.empty(len(points), dtype=TIMING_DTYPE)
+    for i, point in enumerate(points):
+        records[i] = point
+    return records
+
+
+def test_constant_timeline_moves_at_base_speed():
+    timeline = TimingTimeline.from_records(None, 150.0)
+    assert timeline.position_at(12.5) == pytest.approx(12.5)
+    assert timeline.beat_length_at(12.5) == pytest.approx(0.4)
+
+
+def test_bpm_change_changes_note_speed():
+    # 120 BPM を基準に、10 秒から 240 BPM（2倍の速さ）、20 秒からスクロール速度 0.5 で 240 BPM（等速）
+    timeline = TimingTimeline.from_records(make_records([(0.0, 120.0, 1.0), (10.0, 240.0, 1.0),
+                                                         (20.0, 0.0, 0.5)]), 120.0)
+    assert timeline.position_at(10.0) == pytest.approx(10.0)
+    assert timeline.position_at(15.0) == pytest.approx(20.0)
+    assert timeline.position_at(25.0) == pytest.approx(35.0)
+    assert timeline.bpm_at(25.0) == 240.0
+    assert timeline.beat_length_at(15.0) == pytest.approx(0.25)
+
+
+def test_base_bpm_defaults_to_first_timing_point():
+    timeline = TimingTimeline.from_records(make_records([(0.0, 180.0, 1.0), (4.0, 90.0, 1.0)]))
+    assert timeline.base_bpm == 180.0
+    assert timeline.position_at(6.0) == pytest.approx(5.0)
+
+
+def test_scroll_zero_stops_notes():
+    timeline = TimingTimeline([0.0, 5.0, 6.0], [120.0, 0.0, 0.0], [1.0, 0.0, 1.0])
+    assert timeline.position_at(5.5) == pytest.approx(5.0)
+    assert timeline.position_at(7.0) == pytest.approx(6.0)
+
+
+def test_positions_at_matches_position_at():
+    rng = np.random.default_rng(0)
+    times = np.sort(rng.uniform(0, 100, 1000))
+    timeline = TimingTimeline(times, rng.uniform(60, 240, 1000), rng.uniform(0, 2, 1000))
+    samples = rng.uniform(-5, 105, 200)
+    expected = [timeline.position_at(t) for t in samples]
+    assert np.allclose(timeline.positions_at(samples), expected)
+
+
+def test_visible_notes_follow_tempo():
+    # 10 秒から 2 倍のテンポになると、判定ラインの 1 秒前のノーツは 2 倍離れて見える
+    timeline = TimingTimeline([0.0, 10.0], [120.0, 240.0], [1.0, 1.0])
+    chart = NoteChart([0, 1], [9.0, 11.0], 4, timeline)
+    lanes, ys = chart.visible_notes(10.0, 3.0, 2.0, 500, 100)
+    assert lanes.tolist() == [0, 1]
+    assert ys.tolist() == pytest.approx([600.0, 300.0])
+
+
+def test_negative_scroll_is_rejected():
+    with pytest.raises(ValueError):
+        TimingTimeline([0.0], [120.0], [-1.0])
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+文字列描画のキャッシュ
+毎フレーム同じ文字列を font.render し直さないよう、描画済みの Surface を保持する。
+スコアやコンボのように頻繁に変わる数値は、事前に描画した数字を並べて表示する
+"""
+
+from collections import OrderedDict
+
+import pygame
+
+# キャッシュするSurfaceの合計サイズの上限（バイト）
+TEXT_CACHE_MAX_BYTES = 8 * 1024 * 1024
+
+
+class TextCache:
+    """(フォント, 文字列, 色, アンチエイリアス) をキーに描画済みの Surface を保持するLRUキャッシュ"""
+    def __init__(self, max_bytes=TEXT_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+
+    def render(self, font, text, color, antialias=True):
+        """文字列を描画した Surface を返す（キャッシュにあれば再利用する）"""
+        key = (font, text, tuple(color), antialias)
+        surface = self.entries.get(key)
+        if surface is not None:
+            self.entries.move_to_end(key)
+            return surface
+
+        surface = font.render(text, antialias, color)
+        self.entries[key] = surface
+        self.total_bytes += self._surface_bytes(surface)
+
+        # 上限を超えたら古いものから削除
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            _, old_surface = self.entries.popitem(last=False)
+            self.total_bytes -= self._surface_bytes(old_surface)
+        return surface
+
+    def blit_number(self, dest, font, prefix, number, color, antialias=True, **rect_args):
+        """接頭辞と数値を、描画済みの文字を並べて dest に描画する（rect_args は get_rect の位置指定）"""
+        surfaces = [self.render(font, prefix, color, antialias)]
+        surfaces.extend(self.render(font, digit, color, antialias) for digit in str(number))
+
+        width = sum(surface.get_width() for surface in surfaces)
+        height = max(surface.get_height() for surface in surfaces)
+        rect = pygame.Rect(0, 0, width, height)
+        for name, value in rect_args.items():
+            setattr(rect, name, value)
+        x, y = rect.topleft
+        dest.blits([(surface, (x + offset, y)) for surface, offset in zip(surfaces, self._offsets(surfaces))],
+                   doreturn=False)
+        return rect
+
+    @staticmethod
+    def _offsets(surfaces):
+        """各文字のX方向の位置を返す"""
+        offset = 0
+        for surface in surfaces:
+            yield offset
+            offset += surface.get_width()
+
+    @staticmethod
+    def _surface_bytes(surface):
+        return surface.get_width() * surface.get_height() * surface.get_bytesize()
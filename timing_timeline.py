@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+テンポと譜面の流れる速さのタイムライン
+変化点（タイミングポイント）ごとに BPM と流れる速さの倍率（スクロール速度）を持つ。
+ノーツの流れる速さは スクロール速度 × BPM / 基準の BPM で、テンポが上がるとノーツも速く流れる。
+各区間の始まりまでの累積の移動量（基準の速さで流れる秒数）を前もって計算しておく。
+ノーツの移動量は譜面の読み込み時に1度だけ求めるので、描画のたびに必要なのは
+現在時刻の移動量（1回の二分探索と1回の線形補間）だけで、変化点が数千あっても毎フレームの計算量はほぼ変わらない
+"""
+
+import bisect
+
+import numpy as np
+
+DEFAULT_BPM = 120.0  # BPM が分からない譜面で使う値
+
+
+class TimingTimeline:
+    """テンポとスクロール速度の変化点の列
+
+    times は変化点の時刻（秒）、bpms はその時刻からの BPM（0 以下なら直前の BPM を引き継ぐ）、
+    scrolls はその時刻からのスクロール速度の倍率（0 なら停止、負の値は使えない）。
+    base_bpm はノーツが基準の速さ（NOTE_SPEED）で流れる BPM で、省略すると最初の変化点の BPM になる。
+    最初の変化点より前は、最初の変化点の値が続くものとして扱う
+    """
+    def __init__(self, times=(), bpms=(), scrolls=(), default_bpm=DEFAULT_BPM, base_bpm=None):
+        times = np.asarray(times, dtype=np.float64)
+        bpms = np.asarray(bpms, dtype=np.float64)
+        scrolls = np.asarray(scrolls, dtype=np.float64)
+        if not (len(times) == len(bpms) == len(scrolls)):
+            raise ValueError("タイミングポイントの配列の長さがそろっていません")
+        if len(times) == 0:
+            times, bpms, scrolls = np.zeros(1), np.full(1, float(default_bpm)), np.ones(1)
+        if not (np.all(np.isfinite(times)) and np.all(np.isfinite(bpms)) and np.all(np.isfinite(scrolls))):
+            raise ValueError("タイミングポイントに数値でない値があります")
+        if np.any(scrolls < 0):
+            raise ValueError("スクロール速度に負の値は使えません")
+
+        # 時間順に並べ替え、BPM の指定がない変化点は直前の BPM を引き継ぐ
+        order = np.argsort(times, kind="stable")
+        times, bpms, scrolls = times[order], bpms[order], scrolls[order]
+        if bpms[0] <= 0:
+            bpms[0] = default_bpm
+        inherited = np.maximum.accumulate(np.where(bpms > 0, np.arange(len(bpms)), 0))
+        bpms = bpms[inherited]
+
+        self.times = times
+        self.bpms = bpms
+        self.scrolls = scrolls
+        self.base_bpm = float(base_bpm) if base_bpm and base_bpm > 0 else float(bpms[0])
+        # 区間ごとの流れる速さ（基準の速さに対する倍率）と、各区間の始まりまでの累積の移動量
+        self.velocities = scrolls * bpms / self.base_bpm
+        self.positions = np.concatenate([[0.0], np.cumsum(np.diff(times) * self.velocities[:-1])])
+
+        # 毎フレームの計算は要素が1つだけなので、Python のリストで二分探索する方が速い
+        self._time_list = times.tolist()
+        self._position_list = self.positions.tolist()
+        self._velocity_list = self.velocities.tolist()
+        self._bpm_list = bpms.tolist()
+
+    @classmethod
+    def from_records(cls, records, default_bpm=None):
+        """譜面ファイルのタイミングポイント（beatmap_format.TIMING_DTYPE の配列）から作る
+
+        default_bpm は譜面の BPM で、基準の BPM にも使う（なければ最初の変化点の BPM が基準になる）
+        """
+        base_bpm = default_bpm if default_bpm and default_bpm > 0 else None
+        default_bpm = base_bpm or DEFAULT_BPM
+        if records is None or len(records) == 0:
+            return cls(default_bpm=default_bpm)
+        return cls(records["time"], records["bpm"], records["scroll"], default_bpm, base_bpm)
+
+    def __len__(self):
+        return len(self.times)
+
+    def _segment(self, time):
+        """time を含む区間の番号"""
+        return max(bisect.bisect_right(self._time_list, time) - 1, 0)
+
+    def position_at(self, time):
+        """時刻 time までの移動量（基準の速さで流れる秒数）"""
+        k = self._segment(time)
+        return self._position_list[k] + (time - self._time_list[k]) * self._velocity_list[k]
+
+    def positions_at(self, times):
+        """時刻の配列に対する移動量の配列（ノーツの移動量を譜面の読み込み時にまとめて計算する）"""
+        times = np.asarray(times, dtype=np.float64)
+        k = np.maximum(np.searchsorted(self.times, times, side="right") - 1, 0)
+        return self.positions[k] + (times - self.times[k]) * self.velocities[k]
+
+    def bpm_at(self, time):
+        """時刻 time の BPM"""
+        return self._bpm_list[self._segment(time)]
+
+    def beat_length_at(self, time):
+        """時刻 time の1拍の長さ（秒）"""
+        return 60.0 / self.bpm_at(time)